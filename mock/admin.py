@@ -1,3 +1,14 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import Ingrediente, Reserva
+
+
+@admin.register(Ingrediente)
+class IngredienteAdmin(admin.ModelAdmin):
+    list_display = ("nombre", "cantidad")
+
+
+@admin.register(Reserva)
+class ReservaAdmin(admin.ModelAdmin):
+    list_display = ("id", "clave", "estado", "creado_en", "expira_en")
+    list_filter = ("estado",)
@@ -0,0 +1,148 @@
+"""
+Inventario del mock de M1 guardado en la base, compartido por los workers.
+
+Reservar descuenta con UPDATE condicionales
+(``cantidad = cantidad - n WHERE cantidad >= n``) dentro de una transacción:
+si algún ingrediente no alcanza se deshace todo. Las reservas vencen a los
+``MOCK_RESERVA_TTL`` segundos y ``barrer_vencidas`` (comando
+``barrer_reservas``, o al quedarse sin stock) devuelve lo apartado.
+"""
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Ingrediente, Reserva
+
+INVENTARIO_INICIAL = {
+    "pan": 100, "lechuga": 120, "tomate": 120, "cebolla": 100,
+    "carne": 80, "pollo": 80, "queso": 90, "papas": 150,
+    "fideos": 100, "salsa_pomodoro": 80, "aceite": 200, "sal": 200,
+    "azucar": 80, "arroz": 100, "mayonesa": 80,
+}
+
+
+class SinStock(Exception):
+    def __init__(self, faltantes):
+        super().__init__(", ".join(faltantes))
+        self.faltantes = set(faltantes)
+
+
+class ReservaLiberada(Exception):
+    """La clave es de una reserva ya liberada: un reintento no la vuelve a apartar."""
+
+
+def existencias():
+    return dict(Ingrediente.objects.order_by("nombre").values_list("nombre", "cantidad"))
+
+
+def reponer(cantidades=None):
+    """Deja el stock en ``cantidades`` (por defecto el inicial) y anula las reservas activas."""
+    cantidades = cantidades or INVENTARIO_INICIAL
+    with transaction.atomic():
+        Reserva.objects.filter(estado=Reserva.Estado.ACTIVA).update(estado=Reserva.Estado.LIBERADA)
+        for nombre, cantidad in cantidades.items():
+            Ingrediente.objects.update_or_create(nombre=nombre, defaults={"cantidad": cantidad})
+
+
+def _descontar(demanda):
+    faltantes = []
+    # Orden fijo de filas: dos reservas concurrentes no se bloquean en cruz.
+    for nombre, cantidad in sorted(demanda.items()):
+        actualizadas = Ingrediente.objects.filter(nombre=nombre, cantidad__gte=cantidad).update(
+            cantidad=F("cantidad") - cantidad
+        )
+        if not actualizadas:
+            faltantes.append(nombre)
+    if faltantes:
+        raise SinStock(faltantes)
+
+
+def devolver(demanda):
+    for nombre, cantidad in sorted(demanda.items()):
+        Ingrediente.objects.filter(nombre=nombre).update(cantidad=F("cantidad") + cantidad)
+
+
+def _reservar(demanda, lineas, clave):
+    ttl = timedelta(seconds=settings.MOCK_RESERVA_TTL)
+    try:
+        with transaction.atomic():
+            _descontar(demanda)
+            return Reserva.objects.create(
+                clave=clave, demanda=demanda, lineas=lineas, expira_en=timezone.now() + ttl,
+            )
+    except IntegrityError:
+        # Otro worker creó la reserva con la misma clave; lo descontado se deshizo.
+        return Reserva.objects.get(clave=clave)
+
+
+def _reactivar(reserva, demanda, lineas):
+    """Vuelve a apartar una reserva vencida, con la misma clave e id."""
+    ttl = timedelta(seconds=settings.MOCK_RESERVA_TTL)
+    with transaction.atomic():
+        _descontar(demanda)
+        if not Reserva.objects.filter(pk=reserva.pk, estado=Reserva.Estado.VENCIDA).update(
+            estado=Reserva.Estado.ACTIVA, demanda=demanda, lineas=lineas, expira_en=timezone.now() + ttl,
+        ):
+            # Otro worker la reactivó (o cerró) antes: se deshace lo descontado.
+            transaction.set_rollback(True)
+    return Reserva.objects.get(pk=reserva.pk)
+
+
+def reservar(demanda, lineas, clave=None):
+    """
+    Aparta ``demanda`` (todo o nada) y devuelve la ``Reserva``; si ``clave``
+    ya se usó devuelve la existente, salvo que haya vencido (se vuelve a
+    apartar) o se haya liberado (``ReservaLiberada``). Sin stock lanza
+    ``SinStock``, salvo que barrer reservas vencidas libere lo necesario.
+    """
+    existente = Reserva.objects.filter(clave=clave).first() if clave else None
+    if existente is None:
+        apartar = partial(_reservar, demanda, lineas, clave)
+    elif existente.estado == Reserva.Estado.VENCIDA:
+        apartar = partial(_reactivar, existente, demanda, lineas)
+    elif existente.estado == Reserva.Estado.LIBERADA:
+        raise ReservaLiberada(clave)
+    else:
+        return existente
+    try:
+        return apartar()
+    except SinStock:
+        if not barrer_vencidas():
+            raise
+    return apartar()
+
+
+def _cerrar(reserva_id, estado, devolver_stock):
+    """Pasa una reserva activa a ``estado`` (compare-and-swap). ``False`` si no estaba activa."""
+    try:
+        with transaction.atomic():
+            filas = Reserva.objects.filter(pk=reserva_id, estado=Reserva.Estado.ACTIVA)
+            demanda = filas.values_list("demanda", flat=True).first()
+            if demanda is None or not filas.update(estado=estado):
+                return False
+            if devolver_stock:
+                devolver(demanda)
+            return True
+    except ValidationError:
+        return False
+
+
+def liberar(reserva_id):
+    return _cerrar(reserva_id, Reserva.Estado.LIBERADA, devolver_stock=True)
+
+
+def confirmar(reserva_id):
+    return _cerrar(reserva_id, Reserva.Estado.CONFIRMADA, devolver_stock=False)
+
+
+def barrer_vencidas(limite=500):
+    """Devuelve al stock las reservas activas vencidas. Retorna cuántas."""
+    vencidas = Reserva.objects.filter(
+        estado=Reserva.Estado.ACTIVA, expira_en__lte=timezone.now()
+    ).values_list("pk", flat=True)[:limite]
+    return sum(_cerrar(pk, Reserva.Estado.VENCIDA, devolver_stock=True) for pk in list(vencidas))
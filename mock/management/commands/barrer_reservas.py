@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from mock import inventario
+
+
+class Command(BaseCommand):
+    help = "Devuelve al stock del mock de M1 las reservas vencidas"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cada", type=float, default=30, help="Segundos entre barridos")
+        parser.add_argument("--una-vez", action="store_true", help="Un barrido y termina")
+        parser.add_argument("--reponer", action="store_true", help="Antes, deja el stock inicial")
+
+    def handle(self, *args, **opts):
+        if opts["reponer"]:
+            inventario.reponer()
+            self.stdout.write("Stock repuesto.")
+        while True:
+            n = inventario.barrer_vencidas()
+            if n:
+                self.stdout.write(f"Reservas vencidas devueltas: {n}")
+            if opts["una_vez"]:
+                return
+            time.sleep(opts["cada"])
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-16 22:55
+
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Ingrediente',
+            fields=[
+                ('nombre', models.CharField(max_length=40, primary_key=True, serialize=False)),
+                ('cantidad', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Reserva',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('clave', models.CharField(blank=True, max_length=100, null=True, unique=True)),
+                ('demanda', models.JSONField(default=dict)),
+                ('lineas', models.JSONField(default=list)),
+                ('estado', models.CharField(choices=[('activa', 'Activa'), ('confirmada', 'Confirmada'), ('liberada', 'Liberada'), ('vencida', 'Vencida')], default='activa', max_length=12)),
+                ('creado_en', models.DateTimeField(default=django.utils.timezone.now)),
+                ('expira_en', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('estado', 'activa')), fields=['expira_en'], name='reserva_activas_idx')],
+            },
+        ),
+    ]
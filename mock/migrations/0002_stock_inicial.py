@@ -0,0 +1,27 @@
+from django.db import migrations
+
+STOCK_INICIAL = {
+    "pan": 100, "lechuga": 120, "tomate": 120, "cebolla": 100,
+    "carne": 80, "pollo": 80, "queso": 90, "papas": 150,
+    "fideos": 100, "salsa_pomodoro": 80, "aceite": 200, "sal": 200,
+    "azucar": 80, "arroz": 100, "mayonesa": 80,
+}
+
+
+def cargar(apps, schema_editor):
+    Ingrediente = apps.get_model("mock", "Ingrediente")
+    Ingrediente.objects.bulk_create(
+        [Ingrediente(nombre=n, cantidad=c) for n, c in STOCK_INICIAL.items()],
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mock", "0001_inventario"),
+    ]
+
+    operations = [
+        migrations.RunPython(cargar, migrations.RunPython.noop),
+    ]
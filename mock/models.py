@@ -1,3 +1,42 @@
+import uuid
+
 from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+
+class Ingrediente(models.Model):
+    """Stock del mock de M1; compartido por todos los workers."""
+    nombre = models.CharField(max_length=40, primary_key=True)
+    # PositiveIntegerField agrega un CHECK (cantidad >= 0) en la base.
+    cantidad = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.nombre}: {self.cantidad}"
+
+
+class Reserva(models.Model):
+    """Stock apartado para un pedido hasta ``expira_en``."""
+    class Estado(models.TextChoices):
+        ACTIVA = "activa", "Activa"
+        CONFIRMADA = "confirmada", "Confirmada"
+        LIBERADA = "liberada", "Liberada"
+        VENCIDA = "vencida", "Vencida"
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    # Idempotency-Key del cliente: reintentos devuelven la misma reserva.
+    clave = models.CharField(max_length=100, unique=True, null=True, blank=True)
+    demanda = models.JSONField(default=dict)  # ingrediente -> cantidad
+    lineas = models.JSONField(default=list)
+    estado = models.CharField(max_length=12, choices=Estado.choices, default=Estado.ACTIVA)
+    creado_en = models.DateTimeField(default=timezone.now)
+    expira_en = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            # Barrido de vencidas: solo recorre las activas.
+            models.Index(fields=["expira_en"], condition=Q(estado="activa"), name="reserva_activas_idx"),
+        ]
 
-# Create your models here.
+    def __str__(self):
+        return f"Reserva {self.id} ({self.estado})"
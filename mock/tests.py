@@ -1,3 +1,121 @@
+from datetime import timedelta
+
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from . import inventario
+from .models import Ingrediente, Reserva
+
+
+def _stock(nombre):
+    return Ingrediente.objects.get(nombre=nombre).cantidad
+
+
+class StockPorLotesTest(TestCase):
+    def _reservar(self, items, clave=None):
+        headers = {"HTTP_IDEMPOTENCY_KEY": clave} if clave else {}
+        return self.client.post(
+            "/mock/stock/validar-reservar", {"pedido_id": clave, "items": items},
+            content_type="application/json", **headers,
+        )
+
+    def test_reserva_lote_con_demanda_agregada(self):
+        pan = _stock("pan")
+        r = self._reservar([{"plato_id": "HOTDOG", "cantidad": 2}, {"plato_id": "HAMB_CARNE", "cantidad": 1}])
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual([l["ok"] for l in r.json()["lineas"]], [True, True])
+        self.assertEqual(_stock("pan"), pan - 3)
+
+        self.client.post("/mock/stock/liberar", {"reserva_id": r.json()["reserva_id"]},
+                         content_type="application/json")
+        self.assertEqual(_stock("pan"), pan)
+
+    def test_todo_o_nada(self):
+        Ingrediente.objects.filter(nombre="pollo").update(cantidad=1)
+        carne = _stock("carne")
+        r = self._reservar([{"plato_id": "HAMB_CARNE", "cantidad": 1}, {"plato_id": "HAMB_POLLO", "cantidad": 2}])
+        self.assertEqual(r.status_code, 409)
+        lineas = r.json()["lineas"]
+        self.assertTrue(lineas[0]["ok"])
+        self.assertEqual(lineas[1]["detail"], "Sin stock de pollo")
+        self.assertEqual((_stock("carne"), _stock("pollo")), (carne, 1))
+
+    def test_plato_inexistente_y_reintento_idempotente(self):
+        r = self._reservar([{"plato_id": "NADA", "cantidad": 1}])
+        self.assertEqual(r.json()["lineas"][0]["detail"], "Plato no existe")
+
+        pan = _stock("pan")
+        a = self._reservar([{"plato_id": "HOTDOG", "cantidad": 1}], clave="p-1").json()
+        b = self._reservar([{"plato_id": "HOTDOG", "cantidad": 1}], clave="p-1").json()
+        self.assertEqual(a["reserva_id"], b["reserva_id"])
+        self.assertEqual(_stock("pan"), pan - 1)
+
+    def test_formato_viejo_un_plato(self):
+        r = self.client.post(reverse("mock:validar_reservar"), {"plato_id": "ENSALADA"},
+                             content_type="application/json")
+        self.assertEqual(r.status_code, 200)
+
+
+class ReservasConVencimientoTest(TestCase):
+    def test_barrido_devuelve_vencidas(self):
+        pan = _stock("pan")
+        r = inventario.reservar({"pan": 5}, [])
+        Reserva.objects.filter(pk=r.pk).update(expira_en=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(_stock("pan"), pan - 5)
+
+        self.assertEqual(inventario.barrer_vencidas(), 1)
+        self.assertEqual(_stock("pan"), pan)
+        # Una vencida ya no se puede liberar ni confirmar (no devuelve dos veces).
+        self.assertFalse(inventario.liberar(r.pk))
+        self.assertFalse(inventario.confirmar(r.pk))
+
+    def test_sin_stock_barre_y_reintenta(self):
+        Ingrediente.objects.filter(nombre="sal").update(cantidad=3)
+        vieja = inventario.reservar({"sal": 3}, [])
+        with self.assertRaises(inventario.SinStock):
+            inventario.reservar({"sal": 2}, [])
+
+        Reserva.objects.filter(pk=vieja.pk).update(expira_en=timezone.now())
+        inventario.reservar({"sal": 2}, [])
+        self.assertEqual(_stock("sal"), 1)
+
+    def test_reintento_tras_vencer_vuelve_a_apartar(self):
+        pan = _stock("pan")
+        r = inventario.reservar({"pan": 2}, [], clave="p-9")
+        Reserva.objects.filter(pk=r.pk).update(expira_en=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(inventario.barrer_vencidas(), 1)
+        self.assertEqual(_stock("pan"), pan)
+
+        otra = inventario.reservar({"pan": 2}, [], clave="p-9")
+        self.assertEqual((otra.pk, otra.estado), (r.pk, Reserva.Estado.ACTIVA))
+        self.assertGreater(otra.expira_en, timezone.now())
+        self.assertEqual(_stock("pan"), pan - 2)
+        # Ahora sí aparta stock: confirmarla no deja el inventario corrido.
+        self.assertTrue(inventario.confirmar(otra.pk))
+
+    def test_reintento_de_reserva_liberada_falla(self):
+        pan = _stock("pan")
+        r = inventario.reservar({"pan": 1}, [], clave="p-10")
+        self.assertTrue(inventario.liberar(r.pk))
+        with self.assertRaises(inventario.ReservaLiberada):
+            inventario.reservar({"pan": 1}, [], clave="p-10")
+        self.assertEqual(_stock("pan"), pan)
+
+    def test_confirmar_consume_la_reserva(self):
+        pan = _stock("pan")
+        r = inventario.reservar({"pan": 2}, [])
+        self.assertTrue(inventario.confirmar(r.pk))
+        self.assertFalse(inventario.liberar(r.pk))
+        self.assertFalse(inventario.liberar("no-es-uuid"))
+        self.assertEqual(_stock("pan"), pan - 2)
+
 
-# Create your tests here.
+class CocinaM4Test(TestCase):
+    def test_recibe_pedido_de_enviar_pedido(self):
+        r = self.client.post("/mock/cocina/pedidos", {"id": "abc", "mesa": 3, "items": []},
+                             content_type="application/json")
+        self.assertEqual(r.status_code, 201)
+        self.assertEqual(r.json()["id"], "abc")
+        r = self.client.post("/mock/cocina/pedidos", {"mesa": 3}, content_type="application/json")
+        self.assertEqual(r.status_code, 400)
@@ -1,5 +1,5 @@
 # mock/urls.py
-from django.urls import path
+from django.urls import path, re_path
 from . import views
 
 app_name = "mock"
@@ -9,5 +9,11 @@ urlpatterns = [
     path("stock/estado/",         views.stock_estado,       name="stock_estado"),
     path("validar-reservar/",     views.validar_reservar,   name="validar_reservar"),
     path("liberar/",              views.liberar,            name="liberar"),
+    # Contrato de M1 que usa pedidos.adapters.StockClientM1 (sin barra final).
+    re_path(r"^stock/validar-reservar/?$", views.validar_reservar, name="stock_validar_reservar"),
+    re_path(r"^stock/liberar/?$",          views.liberar,          name="stock_liberar"),
+    re_path(r"^stock/confirmar/?$",        views.confirmar,        name="stock_confirmar"),
+    # Contrato de M4 que usa pedidos.adapters.CocinaClientM4.
+    re_path(r"^cocina/pedidos/?$",         views.cocina_recibir_pedido, name="cocina_recibir_pedido"),
     path("cocina/pedido-listo/",  views.cocina_pedido_listo, name="cocina_pedido_listo"),
 ]
@@ -1,16 +1,13 @@
 # mock/views.py
 import json
-import requests
+import uuid
+
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 
-# --- inventario demo ---
-INVENTARIO = {
-    "pan": 100, "lechuga": 120, "tomate": 120, "cebolla": 100,
-    "carne": 80, "pollo": 80, "queso": 90, "papas": 150,
-    "fideos": 100, "salsa_pomodoro": 80, "aceite": 200, "sal": 200,
-    "azucar": 80, "arroz": 100, "mayonesa": 80,
-}
+from pedidos import webhooks
+
+from . import inventario
 
 MENU = [
     {"id": "HAMB_CARNE",  "nombre": "Hamburguesa de carne",
@@ -33,95 +30,171 @@ def _buscar_plato(pid):
             return p
     return None
 
-def _api_base(request) -> str:
-    return request.build_absolute_uri("/").rstrip("/")
-
-def _abs(request, path: str) -> str:
-    if not path.startswith("/"):
-        path = "/" + path
-    return f"{_api_base(request)}{path}"
-
-def _ensure_slash(url: str) -> str:
-    return url if url.endswith("/") else url + "/"
-
 # --------- endpoints demo ----------
 def menu(request):
     return JsonResponse({"platos": [{"codigo": p["id"], "nombre": p["nombre"]} for p in MENU]})
 
 def stock_estado(request):
-    return JsonResponse({"inventario": INVENTARIO})
+    return JsonResponse({"inventario": inventario.existencias()})
+
+# --------- stock por lotes ----------
+# Una reserva cubre todas las líneas de un pedido: se valida y descuenta la
+# demanda agregada de ingredientes de una vez (todo o nada). El stock vive en
+# la base (ver mock.inventario), así todos los workers ven el mismo.
+
+
+def _leer_json(request):
+    try:
+        return json.loads(request.body.decode("utf-8") or "{}")
+    except Exception:
+        return None
+
+
+def _items(data):
+    """Líneas ``{plato_id, cantidad}`` del body; acepta el formato viejo de un solo ``plato_id``."""
+    if "items" not in data:
+        return [{"plato_id": data.get("plato_id"), "cantidad": 1}]
+    items = data.get("items")
+    if not isinstance(items, list):
+        return None
+    return [
+        {"plato_id": it.get("plato_id") or it.get("codigo"), "cantidad": it.get("cantidad", 1)}
+        for it in items if isinstance(it, dict)
+    ]
+
+
+def _demanda(items):
+    """``(demanda agregada por ingrediente, resultado por línea)``."""
+    demanda, lineas = {}, []
+    for it in items:
+        linea = {"plato_id": it["plato_id"], "cantidad": it["cantidad"], "ok": True}
+        p = _buscar_plato(it["plato_id"])
+        if not p:
+            linea.update(ok=False, detail="Plato no existe")
+        elif not isinstance(it["cantidad"], int) or it["cantidad"] < 1:
+            linea.update(ok=False, detail="Cantidad inválida")
+        else:
+            for ing, cant in p["ingredientes"].items():
+                demanda[ing] = demanda.get(ing, 0) + cant * it["cantidad"]
+        lineas.append(linea)
+    return demanda, lineas
+
+
+def _marcar_faltantes(lineas, faltantes):
+    for linea in lineas:
+        p = _buscar_plato(linea["plato_id"])
+        sin = sorted(ing for ing in p["ingredientes"] if ing in faltantes) if p else []
+        if sin:
+            linea.update(ok=False, detail="Sin stock de " + ", ".join(sin))
+
 
 @csrf_exempt
 def validar_reservar(request):
+    """
+    Valida y reserva el stock de todas las líneas en una sola llamada.
+    Body: {"pedido_id": "...", "items": [{"plato_id": "HOTDOG", "cantidad": 2}, ...]}
+    200 -> {"ok": true, "reserva_id": "...", "lineas": [...]}
+    409 -> {"ok": false, "lineas": [...]} (no se reserva nada; con
+           ``detail`` si la reserva de ese pedido ya se liberó)
+    """
     if request.method != "POST":
         return JsonResponse({"detail": "Method not allowed"}, status=405)
-    try:
-        data = json.loads(request.body.decode("utf-8"))
-    except Exception:
+    data = _leer_json(request)
+    items = _items(data) if isinstance(data, dict) else None
+    if not items:
         return JsonResponse({"detail": "JSON inválido"}, status=400)
 
-    plato_id = data.get("plato_id")
-    p = _buscar_plato(plato_id)
-    if not p:
-        return JsonResponse({"detail": "Plato no existe"}, status=404)
+    demanda, lineas = _demanda(items)
+    if not all(l["ok"] for l in lineas):
+        return JsonResponse({"ok": False, "lineas": lineas}, status=409)
 
-    for ing, cant in p["ingredientes"].items():
-        if INVENTARIO.get(ing, 0) < cant:
-            return JsonResponse({"ok": False, "detail": f"Sin stock de {ing}"}, status=409)
+    clave = request.headers.get("Idempotency-Key") or data.get("pedido_id")
+    try:
+        reserva = inventario.reservar(demanda, lineas, clave=clave)
+    except inventario.SinStock as e:
+        _marcar_faltantes(lineas, e.faltantes)
+        return JsonResponse({"ok": False, "lineas": lineas}, status=409)
+    except inventario.ReservaLiberada:
+        return JsonResponse({"ok": False, "detail": "Reserva liberada", "lineas": lineas}, status=409)
 
-    for ing, cant in p["ingredientes"].items():
-        INVENTARIO[ing] -= cant
+    return JsonResponse({
+        "ok": True,
+        "reserva_id": str(reserva.id),
+        "expira_en": reserva.expira_en.isoformat(),
+        "lineas": reserva.lineas,
+    })
 
-    return JsonResponse({"ok": True})
 
 @csrf_exempt
 def liberar(request):
+    """
+    Devuelve al stock una reserva completa ({"reserva_id": "..."}) o, en el
+    formato viejo, las líneas indicadas ({"plato_id"} / {"items": [...]}).
+    """
     if request.method != "POST":
         return JsonResponse({"detail": "Method not allowed"}, status=405)
-    try:
-        data = json.loads(request.body.decode("utf-8"))
-    except Exception:
+    data = _leer_json(request)
+    if not isinstance(data, dict):
         return JsonResponse({"detail": "JSON inválido"}, status=400)
 
-    plato_id = data.get("plato_id")
-    p = _buscar_plato(plato_id)
-    if not p:
-        return JsonResponse({"detail": "Plato no existe"}, status=404)
-
-    for ing, cant in p["ingredientes"].items():
-        INVENTARIO[ing] = INVENTARIO.get(ing, 0) + cant
+    if "reserva_id" in data:
+        # Liberar dos veces no es error (reintentos del cliente).
+        return JsonResponse({"ok": True, "liberada": inventario.liberar(data["reserva_id"])})
 
+    items = _items(data)
+    demanda, lineas = _demanda(items or [])
+    if not items or not all(l["ok"] for l in lineas):
+        return JsonResponse({"detail": "Plato no existe", "lineas": lineas}, status=404)
+    inventario.devolver(demanda)
     return JsonResponse({"ok": True})
 
+
 @csrf_exempt
-def cocina_pedido_listo(request):
+def confirmar(request):
+    """Consume una reserva: el stock ya descontado no vuelve. Body: {"reserva_id": "..."}"""
+    if request.method != "POST":
+        return JsonResponse({"detail": "Method not allowed"}, status=405)
+    data = _leer_json(request)
+    if not isinstance(data, dict) or "reserva_id" not in data:
+        return JsonResponse({"detail": "reserva_id requerido"}, status=400)
+    return JsonResponse({"ok": True, "confirmada": inventario.confirmar(data["reserva_id"])})
+
+@csrf_exempt
+def cocina_recibir_pedido(request):
     """
-    Webhook que marca un pedido como LISTO en la API real.
-    Se llama desde UI: POST /api/webhooks/cocina/pedido-listo/
-    Body JSON: {"pedido_id": "<uuid>"}
+    Simula a M4 recibiendo un pedido para preparar (``CocinaClientM4.enviar_pedido``).
+    Body: {"id": "<uuid>", "mesa": 3, "cliente": "...", "items": [...]}
     """
     if request.method != "POST":
         return JsonResponse({"detail": "Method not allowed"}, status=405)
+    data = _leer_json(request)
+    if not isinstance(data, dict) or not data.get("id"):
+        return JsonResponse({"detail": "id requerido"}, status=400)
+    return JsonResponse({"ok": True, "id": data["id"]}, status=201)
 
-    try:
-        data = json.loads(request.body.decode("utf-8") or "{}")
-    except Exception:
+
+@csrf_exempt
+def cocina_pedido_listo(request):
+    """
+    Simula a M4 avisando que uno o varios pedidos están LISTO.
+    Body JSON: {"pedido_id": "<uuid>"} o {"pedido_ids": ["<uuid>", ...]}
+
+    Se aplica en el proceso con el mismo receptor del webhook real
+    (``pedidos.webhooks``), sin una llamada HTTP de vuelta a la propia API.
+    """
+    if request.method != "POST":
+        return JsonResponse({"detail": "Method not allowed"}, status=405)
+    data = _leer_json(request)
+    if not isinstance(data, dict):
         return JsonResponse({"detail": "JSON inválido"}, status=400)
 
-    pid = data.get("pedido_id")
-    if not pid:
+    pids = data.get("pedido_ids") or ([data["pedido_id"]] if data.get("pedido_id") else [])
+    if not pids:
         return JsonResponse({"detail": "pedido_id requerido"}, status=400)
 
-    # Opción A: tu API tiene acción /api/pedidos/<id>/listo/
-    url = _ensure_slash(_abs(request, f"/api/pedidos/{pid}/listo"))
+    eventos = [{"id": str(uuid.uuid4()), "tipo": "pedido.listo", "pedido_id": pid} for pid in pids]
     try:
-        resp = requests.patch(url, timeout=10)
-        # Si tu API no tiene /listo/, puedes cambiar a:
-        # resp = requests.patch(_ensure_slash(_abs(request, f"/api/pedidos/{pid}")),
-        #                      json={"estado": "LISTO"}, timeout=10)
-    except Exception as e:
-        return JsonResponse({"detail": str(e)}, status=500)
-
-    if resp.status_code in (200, 204):
-        return JsonResponse({"ok": True}, status=204)
-    return JsonResponse({"detail": "backend responded", "status": resp.status_code}, status=resp.status_code)
+        resultados = webhooks.procesar(eventos)
+    except webhooks.WebhookError as e:
+        return JsonResponse({"detail": str(e)}, status=e.status)
+    return JsonResponse({"ok": all(r["ok"] for r in resultados), "resultados": resultados})
@@ -1,42 +1,89 @@
-import hmac, hashlib, requests
+import hmac, hashlib
 from django.conf import settings
 
-class StockClientM1:
-    def __init__(self, base_url=None, timeout=5):
-        self.base_url = base_url or settings.M1_BASE_URL
+from .http import get_cliente, get_cliente_async
+
+
+class _Cliente:
+    """
+    Base de los clientes de módulos externos. Todas las llamadas son POST
+    con clave de idempotencia, así que se pueden reintentar. Cada operación
+    tiene su versión ``async`` con prefijo ``a`` (``avalidar_reservar``...)
+    para código que corre en el event loop.
+    """
+    nombre = None
+    base_url_setting = None
+
+    def __init__(self, base_url=None, timeout=None):
+        base_url = base_url or getattr(settings, self.base_url_setting)
+        self.http = get_cliente(self.nombre, base_url)
+        self.ahttp = get_cliente_async(self.nombre, base_url)
         self.timeout = timeout
 
-    def validar_reservar(self, pedido_id, items):
-        url = f"{self.base_url}/stock/validar-reservar"
-        payload = {"pedido_id": str(pedido_id), "items": items}
-        r = requests.post(url, json=payload, timeout=self.timeout)
+    def _kwargs(self, payload, clave):
+        kwargs = {"timeout": self.timeout} if self.timeout else {}
+        return {"json": payload, "idempotente": True, "headers": {"Idempotency-Key": str(clave)}, **kwargs}
+
+    def _post(self, path, payload, clave):
+        r = self.http.post(path, **self._kwargs(payload, clave))
         r.raise_for_status()
         return r.json()
 
-    def liberar_reserva(self, reserva_id):
-        url = f"{self.base_url}/stock/liberar"
-        r = requests.post(url, json={"reserva_id": reserva_id}, timeout=self.timeout)
+    async def _apost(self, path, payload, clave):
+        r = await self.ahttp.post(path, **self._kwargs(payload, clave))
         r.raise_for_status()
         return r.json()
 
+
+class StockClientM1(_Cliente):
+    """Cliente del Módulo 1 (stock). La clave es el pedido o la reserva."""
+    nombre = "m1"
+    base_url_setting = "M1_BASE_URL"
+
+    def validar_reservar(self, pedido_id, items):
+        """
+        Valida y reserva todas las líneas en un solo round trip (todo o nada).
+        ``items``: ``[{"plato_id": ..., "cantidad": n}]``. Devuelve
+        ``{"ok", "reserva_id", "lineas"}``; sin stock responde 409 con el
+        resultado por línea.
+        """
+        payload = {"pedido_id": str(pedido_id), "items": items}
+        return self._post("/stock/validar-reservar", payload, pedido_id)
+
+    async def avalidar_reservar(self, pedido_id, items):
+        payload = {"pedido_id": str(pedido_id), "items": items}
+        return await self._apost("/stock/validar-reservar", payload, pedido_id)
+
+    def liberar_reserva(self, reserva_id):
+        return self._post("/stock/liberar", {"reserva_id": reserva_id}, reserva_id)
+
+    async def aliberar_reserva(self, reserva_id):
+        return await self._apost("/stock/liberar", {"reserva_id": reserva_id}, reserva_id)
+
     def confirmar_descuento(self, reserva_id):
-        url = f"{self.base_url}/stock/confirmar"
-        r = requests.post(url, json={"reserva_id": reserva_id}, timeout=self.timeout)
-        r.raise_for_status()
-        return r.json()
+        return self._post("/stock/confirmar", {"reserva_id": reserva_id}, reserva_id)
 
+    async def aconfirmar_descuento(self, reserva_id):
+        return await self._apost("/stock/confirmar", {"reserva_id": reserva_id}, reserva_id)
 
-class CocinaClientM4:
-    def __init__(self, base_url=None, timeout=5):
-        self.base_url = base_url or settings.M4_BASE_URL
-        self.timeout = timeout
 
-    def enviar_pedido(self, pedido):
-        url = f"{self.base_url}/cocina/pedidos"
-        payload = {"id": str(pedido.id), "mesa": pedido.mesa, "items": pedido.items}
-        r = requests.post(url, json=payload, timeout=self.timeout)
-        r.raise_for_status()
-        return r.json()
+class CocinaClientM4(_Cliente):
+    """Cliente del Módulo 4 (cocina). La clave es el pedido."""
+    nombre = "m4"
+    base_url_setting = "M4_BASE_URL"
+
+    def enviar_pedido(self, pedido_id, mesa, items, cliente=None):
+        payload = {"id": str(pedido_id), "mesa": mesa, "cliente": cliente, "items": items}
+        return self._post("/cocina/pedidos", payload, pedido_id)
+
+    async def aenviar_pedido(self, pedido_id, mesa, items, cliente=None):
+        payload = {"id": str(pedido_id), "mesa": mesa, "cliente": cliente, "items": items}
+        return await self._apost("/cocina/pedidos", payload, pedido_id)
+
+
+def items_de(pedido):
+    """Ítems de un pedido en el formato de M1/M4 (hoy un plato por pedido)."""
+    return [{"plato_id": pedido.plato, "cantidad": 1}] if pedido.plato else []
 
 
 def build_signature(secret: str, body_bytes: bytes) -> str:
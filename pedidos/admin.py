@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Pedido
+from .models import MensajeOutbox, Pedido, PedidoArchivado
 
 @admin.register(Pedido)
 class PedidoAdmin(admin.ModelAdmin):
@@ -7,3 +7,18 @@ class PedidoAdmin(admin.ModelAdmin):
     list_filter  = ("estado", "creado_en")
     search_fields = ("mesa", "cliente", "id")
     ordering = ("-creado_en",)
+
+
+@admin.register(PedidoArchivado)
+class PedidoArchivadoAdmin(admin.ModelAdmin):
+    list_display = ("id", "mesa", "cliente", "estado", "creado_en", "archivado_en")
+    list_filter = ("estado",)
+    search_fields = ("cliente", "id")
+    ordering = ("-creado_en",)
+
+
+@admin.register(MensajeOutbox)
+class MensajeOutboxAdmin(admin.ModelAdmin):
+    list_display = ("id", "pedido_id", "destino", "operacion", "estado", "intentos", "proximo_intento")
+    list_filter = ("estado", "destino", "operacion")
+    search_fields = ("pedido_id",)
@@ -4,3 +4,16 @@ from django.apps import AppConfig
 class PedidosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'pedidos'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        connection_created.connect(_medir_consultas, dispatch_uid="pedidos.metricas")
+
+
+def _medir_consultas(sender, connection, **kwargs):
+    # Consultas y tiempo en la base por request (ver pedidos.metricas).
+    from .metricas import medir_consulta
+
+    if medir_consulta not in connection.execute_wrappers:
+        connection.execute_wrappers.append(medir_consulta)
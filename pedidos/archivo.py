@@ -0,0 +1,62 @@
+"""
+Archivo de pedidos terminados (tabla fría).
+
+``archivar`` mueve a ``PedidoArchivado`` los pedidos CERRADO/CANCELADO cuyo
+último cambio es anterior a un corte, de a ``lote`` por transacción: cada
+vuelta copia las filas y las borra de ``Pedido`` en una transacción corta,
+así que puede correr con el servicio atendiendo. Un pedido terminal ya no
+cambia de estado, por lo que moverlo no compite con las transiciones.
+
+El log de eventos y el outbox no se tocan (referencian ``pedido_id`` sin FK).
+La tabla de pedidos queda con lo activo y lo cerrado recientemente; las
+listas, el admin y la cola de cocina no pagan por el historial.
+"""
+import time
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Pedido, PedidoArchivado
+
+_COLUMNAS = tuple(f.attname for f in Pedido._meta.concrete_fields)
+
+
+def _candidatos(antes):
+    return Pedido.objects.filter(
+        estado__in=Pedido.ESTADOS_TERMINALES, actualizado_en__lt=antes,
+    ).order_by()
+
+
+def pendientes(antes):
+    return _candidatos(antes).count()
+
+
+def _mover(antes, lote):
+    with transaction.atomic():
+        pks = list(_candidatos(antes).select_for_update().values_list("pk", flat=True)[:lote])
+        if not pks:
+            return 0
+        ahora = timezone.now()
+        PedidoArchivado.objects.bulk_create(
+            PedidoArchivado(**fila, archivado_en=ahora)
+            for fila in Pedido.objects.filter(pk__in=pks).values(*_COLUMNAS)
+        )
+        Pedido.objects.filter(pk__in=pks).delete()
+    return len(pks)
+
+
+def archivar(antes, lote=500, pausa=0.0, limite=None):
+    """
+    Mueve los pedidos terminados antes de ``antes``. ``pausa`` (segundos)
+    entre lotes deja pasar a otros escritores; ``limite`` corta tras ese
+    número de pedidos. Devuelve cuántos se movieron.
+    """
+    total = 0
+    while limite is None or total < limite:
+        movidos = _mover(antes, lote if limite is None else min(lote, limite - total))
+        if not movidos:
+            break
+        total += movidos
+        if pausa:
+            time.sleep(pausa)
+    return total
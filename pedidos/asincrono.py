@@ -0,0 +1,69 @@
+"""
+Vistas de lectura para el despliegue ASGI (uvicorn).
+
+DRF no tiene vistas async, y Django ejecuta toda vista sync bajo ASGI en un
+único hilo compartido (``sync_to_async(thread_sensitive=True)``): una
+consulta lenta frena a todas. ``en_hilo`` convierte una vista sync en una
+corrutina que corre la vista completa (ORM y render) en un pool de hilos
+propio, de ``ASYNC_HILOS_DB`` hilos, sin tocar el event loop.
+
+Las rutas calientes se envuelven en ``pedidos.urls`` / ``ui.urls`` solo si
+``settings.ASYNC_VIEWS`` está activo; bajo gunicorn sync no cambia nada.
+"""
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+_ejecutor = None
+
+
+def _pool():
+    global _ejecutor
+    if _ejecutor is None:
+        _ejecutor = ThreadPoolExecutor(settings.ASYNC_HILOS_DB, thread_name_prefix="vistas-db")
+    return _ejecutor
+
+
+def _ejecutar(vista, request, args, kwargs):
+    # Cada hilo del pool tiene su conexión; se cierra si venció o quedó rota.
+    close_old_connections()
+    try:
+        response = vista(request, *args, **kwargs)
+        if hasattr(response, "render") and not response.is_rendered:
+            response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+def en_hilo(vista, antes=None):
+    """
+    Versión async de ``vista``. ``antes(request)`` (corrutina opcional) corre
+    primero en el event loop, p. ej. para precargar catálogos con httpx.
+    """
+
+    @functools.wraps(vista)
+    async def envoltura(request, *args, **kwargs):
+        if antes is not None:
+            await antes(request)
+        loop = asyncio.get_running_loop()
+        # Con el contexto de la request (p. ej. el conteo de consultas de
+        # pedidos.metricas); run_in_executor no lo copia solo.
+        contexto = contextvars.copy_context()
+        return await loop.run_in_executor(
+            _pool(), contexto.run, _ejecutar, vista, request, args, kwargs
+        )
+
+    return envoltura
+
+
+def envolver(patrones, nombres, antes=None):
+    """Pasa a ``en_hilo`` las vistas de ``patrones`` cuyo ``name`` esté en ``nombres``."""
+    for patron in patrones:
+        if getattr(patron, "name", None) in nombres:
+            patron.callback = en_hilo(patron.callback, antes)
+    return patrones
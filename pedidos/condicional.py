@@ -0,0 +1,70 @@
+"""
+GET condicional (ETag / Last-Modified) para las vistas de lectura de pedidos.
+
+Los validadores salen de una sola consulta agregada (``MAX(actualizado_en)``
+y ``COUNT``) sobre el queryset ya filtrado. Si el cliente ya tiene esa
+versión se responde ``304`` sin serializar ni enviar cuerpo. Las listas
+llevan solo ETag: su contenido cambia sin que cambie ``MAX(actualizado_en)``
+al segundo (un pedido sale del filtro y entra otro), y ``If-Modified-Since``
+daría un ``304`` viejo. El detalle lleva también Last-Modified.
+"""
+import zlib
+from calendar import timegm
+
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+
+def _variante(request):
+    # Misma colección con otros parámetros o formato => otro ETag.
+    formato = getattr(getattr(request, "accepted_renderer", None), "format", "")
+    clave = f"{request.META.get('QUERY_STRING', '')}|{formato}"
+    return zlib.crc32(clave.encode("utf-8"))
+
+
+def validadores_lista(request, qs):
+    """``(etag, None)`` de un queryset (sin Last-Modified); una consulta agregada."""
+    agg = qs.order_by().aggregate(ultimo=Max("actualizado_en"), total=Count("pk"))
+    ultimo = agg["ultimo"]
+    marca = int(ultimo.timestamp() * 1_000_000) if ultimo else 0
+    return f'{agg["total"]}-{marca}-{_variante(request):x}', None
+
+
+def validadores_detalle(request, qs, pk):
+    """Validadores de un pedido, o ``(None, None)`` si no existe."""
+    try:
+        ultimo = qs.filter(pk=pk).values_list("actualizado_en", flat=True).first()
+    except (ValidationError, ValueError):
+        return None, None
+    if ultimo is None:
+        return None, None
+    return f"{int(ultimo.timestamp() * 1_000_000)}-{_variante(request):x}", ultimo
+
+
+def marcar(response, etag, ultimo):
+    """
+    Agrega ETag (débil) y Last-Modified. ``no-cache`` hace que el navegador
+    guarde la respuesta pero la revalide siempre (con If-None-Match).
+    """
+    patch_cache_control(response, private=True, no_cache=True)
+    if etag is not None:
+        response["ETag"] = "W/" + quote_etag(etag)
+    if ultimo is not None:
+        response["Last-Modified"] = http_date(ultimo.timestamp())
+    return response
+
+
+def no_modificado(request, etag, ultimo):
+    """
+    Devuelve la respuesta ``304`` (o ``412``) si las precondiciones del
+    request se cumplen con estos validadores; si no, ``None``.
+    """
+    if etag is None:
+        return None
+    base = marcar(HttpResponse(), etag, ultimo)
+    ts = timegm(ultimo.utctimetuple()) if ultimo is not None else None
+    respuesta = get_conditional_response(request, etag=base["ETag"], last_modified=ts, response=base)
+    return None if respuesta is base else respuesta
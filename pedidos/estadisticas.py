@@ -0,0 +1,224 @@
+"""
+Estadísticas operativas (pedidos por hora, tiempo de preparación por plato,
+tasa de cancelación) mantenidas de forma incremental en ``EstadisticaHora``.
+
+``acumular`` se llama desde ``eventos.registrar*``, dentro de la transacción
+de cada alta/transición, y suma a la fila ``(hora, plato)`` con un upsert
+(``INSERT ... ON CONFLICT DO UPDATE``, SQLite >= 3.24 y PostgreSQL).
+``consultar`` lee solo las filas del rango pedido: su costo depende de
+horas × platos, no del tamaño del historial. ``recalcular`` (comando
+``recalcular_estadisticas``) rehace la tabla desde los pedidos y el log;
+``descontar`` resta lo aportado por pedidos que se van a borrar.
+"""
+from datetime import timezone as tz
+from itertools import groupby, islice
+
+from django.db import connection, transaction
+from django.db.models import F, Max, Sum
+from django.utils.timezone import localtime
+
+from .models import EstadisticaHora, EventoPedido, Pedido, PedidoArchivado
+
+Estado = Pedido.Estado
+_CAMPOS = ("creados", "cancelados", "preparados", "segundos_preparacion")
+
+
+def _hora(dt):
+    return dt.astimezone(tz.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def _fila(deltas, hora, plato):
+    return deltas.setdefault((_hora(hora), plato or ""), dict.fromkeys(_CAMPOS, 0))
+
+
+def _sumar(deltas):
+    """``deltas``: ``{(hora, plato): {campo: valor}}``. Un upsert por fila."""
+    if not deltas:
+        return
+    meta = EstadisticaHora._meta
+    qn = connection.ops.quote_name
+    tabla = qn(meta.db_table)
+    columnas = ("hora", "plato") + _CAMPOS
+    sql = (
+        f"INSERT INTO {tabla} ({', '.join(qn(c) for c in columnas)}) "
+        f"VALUES ({', '.join(['%s'] * len(columnas))}) "
+        f"ON CONFLICT ({qn('hora')}, {qn('plato')}) DO UPDATE SET "
+        + ", ".join(f"{qn(c)} = {tabla}.{qn(c)} + excluded.{qn(c)}" for c in _CAMPOS)
+    )
+    hora = meta.get_field("hora")
+    filas = [
+        (hora.get_db_prep_save(h, connection), plato, *(d[c] for c in _CAMPOS))
+        for (h, plato), d in deltas.items()
+    ]
+    with connection.cursor() as c:
+        c.executemany(sql, filas)
+
+
+# ===================== INCREMENTAL =====================
+
+def acumular(pedidos, tipo, cuando):
+    """
+    Suma el alta/transición de ``pedidos`` ocurrida en ``cuando``. Llamar
+    dentro de la transacción del cambio. Solo ``LISTO`` hace una lectura: la
+    entrada a EN_PREPARACION, por el índice ``(pedido_id, id)`` del log.
+    """
+    deltas = {}
+    if tipo == EventoPedido.Tipo.CREADO:
+        for p in pedidos:
+            _fila(deltas, p.creado_en, p.plato)["creados"] += 1
+    elif tipo == EventoPedido.Tipo.TRANSICION:
+        for p in pedidos:
+            if p.estado == Estado.CANCELADO:
+                _fila(deltas, cuando, p.plato)["cancelados"] += 1
+        listos = {p.pk: p for p in pedidos if p.estado == Estado.LISTO}
+        if listos:
+            inicios = (
+                EventoPedido.objects.filter(
+                    pedido_id__in=list(listos), tipo=EventoPedido.Tipo.TRANSICION, estado=Estado.EN_PREPARACION,
+                )
+                .values("pedido_id").annotate(inicio=Max("creado_en"))
+                .values_list("pedido_id", "inicio")
+            )
+            for pk, inicio in inicios:
+                fila = _fila(deltas, cuando, listos[pk].plato)
+                fila["preparados"] += 1
+                fila["segundos_preparacion"] += (cuando - inicio).total_seconds()
+    _sumar(deltas)
+
+
+def acumular_altas(conteos):
+    """
+    ``conteos``: ``{(hora, plato): n}`` de pedidos insertados sin pasar por
+    ``acumular`` (carga masiva de ``seed_pedidos``). Solo suma ``creados``.
+    """
+    deltas = {}
+    for (hora, plato), n in conteos.items():
+        _fila(deltas, hora, plato)["creados"] += n
+    _sumar(deltas)
+
+
+# ===================== RECÁLCULO =====================
+
+def _pedidos(lote):
+    """``(id, plato, creado_en)`` de todo el historial (incluido el archivo)."""
+    for modelo in (Pedido, PedidoArchivado):
+        yield from modelo.objects.order_by().values_list("id", "plato", "creado_en").iterator(chunk_size=lote)
+
+
+def _deltas_de(pedidos, deltas):
+    platos = {pk: plato for pk, plato, _ in pedidos}
+    for _, plato, creado_en in pedidos:
+        _fila(deltas, creado_en, plato)["creados"] += 1
+
+    eventos = (
+        EventoPedido.objects.filter(
+            pedido_id__in=list(platos), tipo=EventoPedido.Tipo.TRANSICION,
+            estado__in=[Estado.EN_PREPARACION, Estado.LISTO, Estado.CANCELADO],
+        )
+        .order_by("pedido_id", "id")
+        .values_list("pedido_id", "estado", "creado_en")
+    )
+    for pk, filas in groupby(eventos, key=lambda e: e[0]):
+        inicio = None
+        for _, estado, cuando in filas:
+            if estado == Estado.EN_PREPARACION:
+                inicio = cuando
+            elif estado == Estado.CANCELADO:
+                _fila(deltas, cuando, platos[pk])["cancelados"] += 1
+            elif inicio is not None:
+                fila = _fila(deltas, cuando, platos[pk])
+                fila["preparados"] += 1
+                fila["segundos_preparacion"] += (cuando - inicio).total_seconds()
+
+
+def recalcular(lote=2000):
+    """
+    Rehace ``EstadisticaHora``. Recorre el historial en lotes y acumula en
+    memoria (una entrada por hora y plato); la tabla se reemplaza en una
+    transacción corta al final. Los cambios hechos mientras recorre pueden
+    quedar fuera: correrlo con poco tráfico. Devuelve las filas escritas.
+    """
+    deltas = {}
+    pedidos = _pedidos(lote)
+    while True:
+        bloque = list(islice(pedidos, lote))
+        if not bloque:
+            break
+        _deltas_de(bloque, deltas)
+    with transaction.atomic():
+        EstadisticaHora.objects.all().delete()
+        _sumar(deltas)
+    return len(deltas)
+
+
+def descontar(pks, lote=2000):
+    """
+    Resta de ``EstadisticaHora`` lo que sumaron los pedidos ``pks`` (altas y
+    transiciones del log), p. ej. antes de borrar los de una prueba de carga.
+    Llamar antes de borrar sus eventos. Borra las filas que quedan en cero.
+    """
+    deltas = {}
+    pks = list(pks)
+    for i in range(0, len(pks), lote):
+        bloque = list(
+            Pedido.objects.filter(pk__in=pks[i:i + lote]).order_by().values_list("id", "plato", "creado_en")
+        )
+        _deltas_de(bloque, deltas)
+    if not deltas:
+        return 0
+    with transaction.atomic():
+        # UPDATE y no ``_sumar``: la fila del INSERT (negativa) violaría el CHECK.
+        for (hora, plato), d in deltas.items():
+            EstadisticaHora.objects.filter(hora=hora, plato=plato).update(
+                **{c: F(c) - d[c] for c in _CAMPOS}
+            )
+        horas = {h for h, _ in deltas}
+        EstadisticaHora.objects.filter(hora__in=horas, creados=0, cancelados=0, preparados=0).delete()
+        # Sin preparados, el resto de la resta de floats es ruido.
+        EstadisticaHora.objects.filter(hora__in=horas, preparados=0).update(segundos_preparacion=0)
+    return len(deltas)
+
+
+# ===================== CONSULTA =====================
+
+def _promedio(segundos, n):
+    return round(segundos / n, 1) if n else None
+
+
+def consultar(desde, hasta, plato=None):
+    """
+    Tablero de ``[desde, hasta)`` (redondeado a horas completas):
+    pedidos y cancelaciones por hora, y por plato la tasa de cancelación y el
+    tiempo medio de preparación (EN_PREPARACION -> LISTO).
+    """
+    qs = EstadisticaHora.objects.filter(hora__gte=_hora(desde), hora__lt=hasta)
+    if plato:
+        qs = qs.filter(plato=plato)
+    sumas = {c: Sum(c) for c in _CAMPOS}
+
+    por_hora = [
+        {"hora": localtime(f["hora"]), "creados": f["creados"], "cancelados": f["cancelados"]}
+        for f in qs.values("hora").annotate(**sumas).order_by("hora")
+    ]
+    por_plato = []
+    for f in qs.values("plato").annotate(**sumas).order_by("plato"):
+        por_plato.append({
+            "plato": f["plato"],
+            "creados": f["creados"],
+            "cancelados": f["cancelados"],
+            "tasa_cancelacion": round(f["cancelados"] / f["creados"], 3) if f["creados"] else None,
+            "preparados": f["preparados"],
+            "preparacion_promedio_s": _promedio(f["segundos_preparacion"], f["preparados"]),
+        })
+    total = qs.aggregate(**sumas)
+    total = {c: total[c] or 0 for c in _CAMPOS}
+    return {
+        "por_hora": por_hora,
+        "por_plato": por_plato,
+        "total": {
+            "creados": total["creados"],
+            "cancelados": total["cancelados"],
+            "tasa_cancelacion": round(total["cancelados"] / total["creados"], 3) if total["creados"] else None,
+            "preparacion_promedio_s": _promedio(total["segundos_preparacion"], total["preparados"]),
+        },
+    }
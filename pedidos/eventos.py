@@ -0,0 +1,383 @@
+"""
+Eventos de pedidos y stream Server-Sent Events.
+
+Cada alta/transición/baja se guarda en ``EventoPedido`` dentro de la misma
+transacción que el cambio, y suma a las estadísticas por hora
+(``pedidos.estadisticas``). El stream envía los eventos con ``id`` mayor al
+``Last-Event-ID`` del cliente, así que al reconectar no se pierde nada.
+
+El id se asigna al insertar, no al confirmar: en PostgreSQL la transacción
+que tomó el id 10 puede confirmar después de la que tomó el 11, y un cursor
+``id > 11`` nunca vería el 10. Por eso la marca que se entrega (``id:`` del
+SSE, ``watermark`` de los deltas, ``marca()``) solo avanza sobre ids
+consecutivos; un hueco se da por cerrado cuando el evento que lo sigue tiene
+más de ``EVENTOS_VENTANA_SEGUNDOS``. Lo posterior al hueco se entrega igual y
+se vuelve a leer hasta entonces: reaplicar un evento no cambia nada.
+
+Para que las pantallas inactivas no cuesten nada, los streams no consultan
+la base en cada vuelta: esperan en una ``Condition`` del proceso. Se
+despierta al confirmar un cambio hecho en este mismo proceso
+(``transaction.on_commit``) o cuando un único hilo vigía por proceso detecta
+un ``id`` nuevo escrito por otro worker.
+
+Bajo WSGI cada stream abierto ocupa un hilo del worker hasta
+``EVENTOS_DURACION_MAXIMA``; a lo sumo ``EVENTOS_STREAMS_POR_PROCESO`` a la vez,
+para dejar hilos a la API. Por encima del cupo el stream envía lo pendiente y
+corta, y el navegador reconecta a los ``EVENTOS_RETRY_MS`` (sondeo).
+Bajo ASGI el stream es un generador ``async`` (``astream``): cada pantalla
+conectada es una corrutina esperando un ``asyncio.Event``, no un hilo, y no
+hay cupo.
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from . import estadisticas, metricas
+from .models import EventoPedido, Pedido
+from .serializers import PedidoSerializer
+
+
+# ===================== REGISTRO =====================
+
+def registrar(pedido, tipo=EventoPedido.Tipo.TRANSICION):
+    """Guarda el evento; llamar dentro de la transacción del cambio."""
+    evento = EventoPedido.objects.create(pedido_id=pedido.pk, tipo=tipo, estado=pedido.estado)
+    estadisticas.acumular([pedido], tipo, evento.creado_en)
+
+    def confirmado():
+        _aviso.publicar(evento.id)
+        metricas.incrementar("pedidos_transiciones_total", tipo=tipo, estado=evento.estado)
+
+    transaction.on_commit(confirmado)
+    return evento
+
+
+def registrar_varios(pedidos, tipo=EventoPedido.Tipo.TRANSICION):
+    """Igual que ``registrar`` para un lote: un solo INSERT."""
+    creados = EventoPedido.objects.bulk_create(
+        EventoPedido(pedido_id=p.pk, tipo=tipo, estado=p.estado) for p in pedidos
+    )
+    if creados:
+        estadisticas.acumular(pedidos, tipo, creados[-1].creado_en)
+        # Sin RETURNING en el INSERT masivo los ids quedan en None.
+        ultimo = max((e.id for e in creados if e.id), default=None)
+        por_estado = Counter(e.estado for e in creados)
+
+        def confirmado():
+            _aviso.publicar(ultimo or ultimo_id())
+            for estado, n in por_estado.items():
+                metricas.incrementar("pedidos_transiciones_total", n, tipo=tipo, estado=estado)
+
+        transaction.on_commit(confirmado)
+    return creados
+
+
+def ultimo_id():
+    return EventoPedido.objects.aggregate(m=Max("id"))["m"] or 0
+
+
+# ===================== MARCA =====================
+
+def _marcas(desde, filas):
+    """
+    Marca segura después de cada fila de ``filas`` (``(id, creado_en, ...)``
+    ordenadas por id): avanza por ids consecutivos o sobre huecos ya viejos,
+    y desde el primer hueco reciente queda fija.
+    """
+    viejo = timezone.now() - timedelta(seconds=settings.EVENTOS_VENTANA_SEGUNDOS)
+    marca, abierta = desde, True
+    for fila in filas:
+        abierta = abierta and (fila[0] == marca + 1 or fila[1] <= viejo)
+        if abierta:
+            marca = fila[0]
+        yield marca
+
+
+def marca():
+    """
+    Marca inicial para un snapshot (``X-Watermark``, página de cocina): el
+    último evento sin huecos recientes por debajo. Lee solo los eventos de la
+    ventana y el anterior a ella.
+    """
+    viejo = timezone.now() - timedelta(seconds=settings.EVENTOS_VENTANA_SEGUNDOS)
+    base = (
+        EventoPedido.objects.filter(creado_en__lte=viejo)
+        .order_by("-id").values_list("id", flat=True).first()
+    ) or 0
+    recientes = EventoPedido.objects.filter(id__gt=base).order_by("id").values_list("id", "creado_en")
+    resultado = base
+    for resultado in _marcas(base, recientes):
+        pass
+    return resultado
+
+
+# ===================== AVISO ENTRE HILOS =====================
+
+class _Aviso:
+    """
+    Último id de evento conocido por el proceso. Los streams esperan aquí;
+    un hilo vigía (uno por proceso, solo mientras haya streams) consulta el
+    máximo id cada ``EVENTOS_POLL_SEGUNDOS`` para ver cambios de otros workers.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._ultimo = 0
+        self._oyentes = 0
+        self._vigia = None
+        # Esperas async: (loop, asyncio.Event) a despertar desde cualquier hilo.
+        self._async = set()
+
+    def publicar(self, evento_id):
+        with self._cond:
+            if evento_id > self._ultimo:
+                self._ultimo = evento_id
+                self._cond.notify_all()
+                for loop, evento in self._async:
+                    loop.call_soon_threadsafe(evento.set)
+
+    def esperar(self, desde, timeout):
+        """Bloquea hasta que haya un id > ``desde`` o venza ``timeout``."""
+        with self._cond:
+            self._oyentes += 1
+            self._asegurar_vigia()
+            try:
+                self._cond.wait_for(lambda: self._ultimo > desde, timeout=timeout)
+            finally:
+                self._oyentes -= 1
+            return self._ultimo
+
+    async def aesperar(self, desde, timeout):
+        """Como ``esperar`` pero sin ocupar un hilo."""
+        espera = (asyncio.get_running_loop(), asyncio.Event())
+        with self._cond:
+            if self._ultimo > desde:
+                return self._ultimo
+            self._oyentes += 1
+            self._async.add(espera)
+            self._asegurar_vigia()
+        try:
+            await asyncio.wait_for(espera[1].wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._cond:
+                self._oyentes -= 1
+                self._async.discard(espera)
+        return self._ultimo
+
+    def _asegurar_vigia(self):
+        if self._vigia is None or not self._vigia.is_alive():
+            self._vigia = threading.Thread(target=self._vigilar, daemon=True)
+            self._vigia.start()
+
+    def _vigilar(self):
+        try:
+            while True:
+                with self._cond:
+                    if self._oyentes == 0:
+                        self._vigia = None
+                        return
+                try:
+                    self.publicar(ultimo_id())
+                except Exception:
+                    close_old_connections()
+                time.sleep(settings.EVENTOS_POLL_SEGUNDOS)
+        finally:
+            close_old_connections()
+
+
+_aviso = _Aviso()
+
+
+# ===================== STREAM SSE =====================
+
+def eventos_desde(desde, limite=200):
+    """
+    Eventos con id > ``desde`` listos para enviar: ``[(id, tipo, dict, marca)]``,
+    con ``marca`` la marca segura después de ese evento.
+    Son dos consultas por lote (eventos + pedidos por pk).
+    """
+    eventos = list(
+        EventoPedido.objects.filter(id__gt=desde)
+        .order_by("id")
+        .values_list("id", "creado_en", "tipo", "pedido_id", "estado")[:limite]
+    )
+    if not eventos:
+        return []
+
+    pks = {e[3] for e in eventos}
+    pedidos = {p.pk: p for p in Pedido.objects.filter(pk__in=pks)}
+    salida = []
+    for (evento_id, _, tipo, pedido_id, estado), marca_segura in zip(eventos, _marcas(desde, eventos)):
+        pedido = pedidos.get(pedido_id)
+        if pedido is None:
+            data = {"id": str(pedido_id), "estado": estado}
+        else:
+            data = PedidoSerializer(pedido).data
+        data["tipo"] = tipo
+        salida.append((evento_id, tipo, data, marca_segura))
+    return salida
+
+
+def _formatear(evento_id, tipo, data):
+    return f"id: {evento_id}\nevent: {tipo}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+class _Cursor:
+    """
+    Posición de un stream: ``marca`` segura (lo que se manda como ``id:``),
+    mayor id ya ``visto`` y los ids enviados por encima de la marca, para no
+    repetirlos mientras un hueco la retiene.
+    """
+
+    def __init__(self, desde):
+        self.marca = self.visto = desde
+        self.enviados = set()
+
+    def avanzar(self, lote):
+        """Mensajes SSE de ``lote`` (de ``eventos_desde(self.marca)``) aún no enviados."""
+        mensajes = []
+        for evento_id, tipo, data, marca_segura in lote:
+            if evento_id not in self.enviados:
+                self.enviados.add(evento_id)
+                mensajes.append(_formatear(marca_segura, tipo, data))
+        if lote:
+            self.marca = lote[-1][3]
+            self.visto = max(self.visto, lote[-1][0])
+            self.enviados = {i for i in self.enviados if i > self.marca}
+        return mensajes
+
+    def espera(self):
+        # El evento que llene un hueco tiene un id menor que ``visto`` y no
+        # despierta a nadie: con un hueco abierto se relee cada POLL.
+        latido = settings.EVENTOS_HEARTBEAT_SEGUNDOS
+        return latido if self.marca >= self.visto else min(latido, settings.EVENTOS_POLL_SEGUNDOS)
+
+
+_streams_lock = threading.Lock()
+_streams_abiertos = 0
+
+
+def _tomar_cupo():
+    global _streams_abiertos
+    with _streams_lock:
+        if _streams_abiertos >= settings.EVENTOS_STREAMS_POR_PROCESO:
+            return False
+        _streams_abiertos += 1
+        return True
+
+
+def _liberar_cupo():
+    global _streams_abiertos
+    with _streams_lock:
+        _streams_abiertos -= 1
+
+
+def stream(desde):
+    """
+    Generador SSE. Envía lo pendiente, luego espera avisos; manda un
+    comentario de keep-alive cada ``EVENTOS_HEARTBEAT_SEGUNDOS`` y corta tras
+    ``EVENTOS_DURACION_MAXIMA`` segundos (el navegador reconecta solo con su
+    ``Last-Event-ID``), para no retener un hilo del servidor indefinidamente.
+    Sin cupo (``EVENTOS_STREAMS_POR_PROCESO``) solo envía lo pendiente.
+    """
+    yield f"retry: {settings.EVENTOS_RETRY_MS}\n\n"
+    if not _tomar_cupo():
+        try:
+            yield from _Cursor(desde).avanzar(eventos_desde(desde))
+        finally:
+            close_old_connections()
+        return
+    fin = time.monotonic() + settings.EVENTOS_DURACION_MAXIMA
+    cursor = _Cursor(desde)
+    latido = time.monotonic()
+    try:
+        while time.monotonic() < fin:
+            mensajes = cursor.avanzar(eventos_desde(cursor.marca))
+            if mensajes:
+                yield from mensajes
+                latido = time.monotonic()
+                continue
+            # Se espera por algo más nuevo que lo ya visto, aunque aún no se
+            # haya podido leer, para no girar en vacío.
+            nuevo = _aviso.esperar(cursor.visto, cursor.espera())
+            if nuevo <= cursor.visto and time.monotonic() - latido >= settings.EVENTOS_HEARTBEAT_SEGUNDOS:
+                yield ": keep-alive\n\n"
+                latido = time.monotonic()
+            cursor.visto = max(cursor.visto, nuevo)
+    finally:
+        _liberar_cupo()
+        close_old_connections()
+
+
+def _eventos_desde_hilo(desde):
+    try:
+        return eventos_desde(desde)
+    finally:
+        close_old_connections()
+
+
+# Consulta en el pool de hilos (no en el hilo único de sync_to_async).
+_aeventos_desde = sync_to_async(_eventos_desde_hilo, thread_sensitive=False)
+
+
+async def astream(desde):
+    """Versión async de ``stream`` para servidores ASGI."""
+    yield f"retry: {settings.EVENTOS_RETRY_MS}\n\n"
+    fin = time.monotonic() + settings.EVENTOS_DURACION_MAXIMA
+    cursor = _Cursor(desde)
+    latido = time.monotonic()
+    while time.monotonic() < fin:
+        mensajes = cursor.avanzar(await _aeventos_desde(cursor.marca))
+        if mensajes:
+            for mensaje in mensajes:
+                yield mensaje
+            latido = time.monotonic()
+            continue
+        nuevo = await _aviso.aesperar(cursor.visto, cursor.espera())
+        if nuevo <= cursor.visto and time.monotonic() - latido >= settings.EVENTOS_HEARTBEAT_SEGUNDOS:
+            yield ": keep-alive\n\n"
+            latido = time.monotonic()
+        cursor.visto = max(cursor.visto, nuevo)
+
+
+# ===================== SINCRONIZACIÓN DELTA =====================
+
+def delta(qs, desde, limite=500):
+    """
+    Cambios en ``qs`` posteriores a la marca ``desde`` (id de EventoPedido).
+
+    Devuelve ``(watermark, pedidos, eliminados, hay_mas)``: los pedidos que
+    cambiaron y siguen dentro de ``qs``, los ids que cambiaron pero ya no
+    están (cerrados/cancelados fuera de la cola, borrados o que dejaron de
+    cumplir el filtro) y si quedan eventos por leer después de ``watermark``.
+    ``watermark`` es la marca segura: con un hueco reciente queda antes de
+    eventos ya devueltos, que vuelven a salir en la próxima llamada.
+    """
+    filas = list(
+        EventoPedido.objects.filter(id__gt=desde)
+        .order_by("id")
+        .values_list("id", "creado_en", "pedido_id")[:limite]
+    )
+    if not filas:
+        return desde, [], [], False
+
+    watermark = desde
+    for watermark in _marcas(desde, filas):
+        pass
+    pks = {pedido_id for _, _, pedido_id in filas}
+    pedidos = list(qs.filter(pk__in=pks))
+    eliminados = pks - {p.pk for p in pedidos}
+    # Retenida en un hueco, "hay más" haría que el cliente relea lo mismo al instante.
+    hay_mas = len(filas) == limite and watermark == filas[-1][0]
+    return watermark, pedidos, sorted(str(pk) for pk in eliminados), hay_mas
@@ -0,0 +1,136 @@
+"""
+Exportación de pedidos en CSV o JSONL por streaming (``/api/pedidos/export/``).
+
+Las filas salen de ``values_list(*CAMPOS).iterator(chunk_size=...)``: en
+PostgreSQL es un cursor del lado del servidor y en SQLite se leen con
+``fetchmany``; nunca está todo el resultado en memoria. Cada bloque de filas
+se convierte y se envía de inmediato, así que la memoria no depende del
+total y el primer byte sale sin esperar la consulta completa.
+
+Bajo ASGI Django consumiría un iterador sync entero antes de enviarlo;
+``aen_hilo`` lo corre en un hilo propio y pasa los bloques al event loop por
+una cola acotada (si el cliente lee lento, el hilo espera).
+"""
+import asyncio
+import csv
+import io
+import json
+import queue
+import threading
+
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .serializers import CAMPOS, filas_pedido
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson es opcional
+    orjson = None
+
+FORMATOS = {
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson; charset=utf-8",
+}
+
+
+def _bloques(qs, chunk_size):
+    filas = qs.order_by("creado_en", "id").values_list(*CAMPOS).iterator(chunk_size=chunk_size)
+    bloque = []
+    for fila in filas:
+        bloque.append(fila)
+        if len(bloque) == chunk_size:
+            yield filas_pedido(bloque)
+            bloque = []
+    if bloque:
+        yield filas_pedido(bloque)
+
+
+def csv_stream(qs, chunk_size=2000):
+    """Encabezado y luego un bloque de líneas CSV por cada ``chunk_size`` filas."""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(CAMPOS)
+    yield buffer.getvalue().encode("utf-8")
+    for pedidos in _bloques(qs, chunk_size):
+        buffer.seek(0)
+        buffer.truncate()
+        escritor.writerows(
+            ["" if p[c] is None else p[c] for c in CAMPOS] for p in pedidos
+        )
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _linea_json(pedido):
+    if orjson is not None:
+        return orjson.dumps(pedido)
+    return json.dumps(pedido, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def jsonl_stream(qs, chunk_size=2000):
+    """Un objeto JSON por línea, con la misma forma que la API."""
+    for pedidos in _bloques(qs, chunk_size):
+        yield b"".join(_linea_json(p) + b"\n" for p in pedidos)
+
+
+def nombre_archivo(formato):
+    return f"pedidos-{timezone.localtime():%Y%m%d-%H%M}.{formato}"
+
+
+def _poner(cola, valor, detener):
+    # ``put`` con espera, pero soltando si el consumidor ya no está.
+    while not detener.is_set():
+        try:
+            cola.put(valor, timeout=0.5)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _tomar(cola, detener):
+    # ``get`` con espera, pero soltando el hilo si el consumidor ya no está:
+    # corre en el executor por defecto del loop, el mismo de las lecturas async.
+    while not detener.is_set():
+        try:
+            return cola.get(timeout=0.5)
+        except queue.Empty:
+            pass
+    return None
+
+
+def _producir(generador, cola, detener):
+    try:
+        for bloque in generador:
+            if not _poner(cola, bloque, detener):
+                return
+        _poner(cola, None, detener)
+    except Exception as e:
+        _poner(cola, e, detener)
+    finally:
+        generador.close()
+        close_old_connections()
+
+
+async def aen_hilo(generador, maximo=4):
+    """
+    Itera ``generador`` (sync, con consultas) en un hilo dedicado: el cursor
+    vive siempre en el mismo hilo y el event loop no se bloquea. A lo sumo
+    ``maximo`` bloques esperan en memoria.
+    """
+    cola = queue.Queue(maxsize=maximo)
+    detener = threading.Event()
+    threading.Thread(target=_producir, args=(generador, cola, detener), daemon=True).start()
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            bloque = await loop.run_in_executor(None, _tomar, cola, detener)
+            if bloque is None:
+                return
+            if isinstance(bloque, Exception):
+                raise bloque
+            yield bloque
+    finally:
+        # Cliente desconectado o fin: el hilo deja de producir y la espera
+        # en curso en el executor (si la hay) termina en medio segundo.
+        detener.set()
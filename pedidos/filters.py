@@ -0,0 +1,70 @@
+import datetime
+
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from .models import Pedido
+
+
+def parse_fecha(valor, nombre):
+    """Acepta fecha-hora ISO o solo fecha (YYYY-MM-DD, a medianoche local)."""
+    try:
+        dt = parse_datetime(valor)
+        d = parse_date(valor) if dt is None else None
+    except ValueError:
+        dt = d = None
+    if dt is None:
+        if d is None:
+            raise ValidationError({nombre: "Fecha inválida, usa ISO 8601."})
+        dt = datetime.datetime.combine(d, datetime.time.min)
+    if timezone.is_naive(dt):
+        dt = timezone.make_aware(dt)
+    return dt
+
+
+def filtrar_pedidos(qs, params):
+    """
+    Filtros de la lista de pedidos (query params):
+    - ``estado``: uno o varios separados por coma (CREADO,LISTO)
+    - ``mesa``: número de mesa
+    - ``cliente``: contiene (sin distinguir mayúsculas)
+    - ``desde`` / ``hasta``: rango sobre ``creado_en`` (desde inclusive,
+      hasta exclusivo)
+    """
+    estado = params.get("estado")
+    if estado:
+        estados = [e.strip().upper() for e in estado.split(",") if e.strip()]
+        invalidos = set(estados) - set(Pedido.Estado.values)
+        if invalidos:
+            raise ValidationError({"estado": f"Estados inválidos: {', '.join(sorted(invalidos))}."})
+        qs = qs.filter(estado__in=estados)
+
+    mesa = params.get("mesa")
+    if mesa:
+        try:
+            qs = qs.filter(mesa=int(mesa))
+        except ValueError:
+            raise ValidationError({"mesa": "Debe ser un número."})
+
+    cliente = params.get("cliente")
+    if cliente:
+        qs = qs.filter(cliente__icontains=cliente)
+
+    desde = params.get("desde")
+    if desde:
+        qs = qs.filter(creado_en__gte=parse_fecha(desde, "desde"))
+
+    hasta = params.get("hasta")
+    if hasta:
+        qs = qs.filter(creado_en__lt=parse_fecha(hasta, "hasta"))
+
+    return qs
+
+
+class PedidoFilterBackend(BaseFilterBackend):
+    def filter_queryset(self, request, queryset, view):
+        if getattr(view, "action", None) != "list":
+            return queryset
+        return filtrar_pedidos(queryset, request.query_params)
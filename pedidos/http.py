@@ -0,0 +1,345 @@
+"""
+Cliente HTTP compartido para las integraciones (M1 stock, M4 cocina).
+
+- Una ``requests.Session`` por proceso, con pool de conexiones keep-alive,
+  así cada llamada no paga un handshake TCP/TLS nuevo.
+- Timeouts separados de conexión y lectura.
+- Reintentos acotados con backoff exponencial y jitter, solo para llamadas
+  marcadas como idempotentes.
+- Un circuit breaker por upstream: tras ``umbral`` fallos seguidos se abre y
+  las llamadas fallan de inmediato (``CircuitoAbierto``) durante ``reset``
+  segundos; luego deja pasar una llamada de prueba.
+
+``estado_integraciones()`` devuelve el estado de los breakers y del pool.
+
+Cada llamada (con sus reintentos) queda en la métrica
+``upstream_request_duration_seconds`` (ver ``pedidos.metricas``).
+
+``ClienteHTTPAsync`` es la versión ``async`` (httpx) para vistas y tareas que
+corren en el event loop (despliegue ASGI): mismo breaker y mismos contadores
+que el cliente sync del upstream.
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+import weakref
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from . import metricas
+
+# Códigos que indican un upstream con problemas (cuentan como fallo y se
+# reintentan). Un 4xx es una respuesta válida del upstream.
+STATUS_REINTENTABLES = {502, 503, 504}
+
+
+class CircuitoAbierto(requests.ConnectionError):
+    """El upstream está marcado como caído; no se intentó la llamada."""
+
+
+class CircuitBreaker:
+    CERRADO = "cerrado"
+    ABIERTO = "abierto"
+    SEMI_ABIERTO = "semi_abierto"
+
+    def __init__(self, nombre, umbral, reset):
+        self.nombre = nombre
+        self.umbral = umbral
+        self.reset = reset
+        self._lock = threading.Lock()
+        self._estado = self.CERRADO
+        self._fallos = 0
+        self._abierto_en = None
+        self._prueba_en_curso = False
+
+    def permitir(self):
+        with self._lock:
+            if self._estado == self.CERRADO:
+                return True
+            if self._estado == self.ABIERTO:
+                if time.monotonic() - self._abierto_en < self.reset:
+                    return False
+                self._estado = self.SEMI_ABIERTO
+            # SEMI_ABIERTO: una sola llamada de prueba a la vez.
+            if self._prueba_en_curso:
+                return False
+            self._prueba_en_curso = True
+            return True
+
+    def exito(self):
+        with self._lock:
+            self._estado = self.CERRADO
+            self._fallos = 0
+            self._prueba_en_curso = False
+
+    def fallo(self):
+        with self._lock:
+            self._fallos += 1
+            self._prueba_en_curso = False
+            if self._estado == self.SEMI_ABIERTO or self._fallos >= self.umbral:
+                self._estado = self.ABIERTO
+                self._abierto_en = time.monotonic()
+
+    def liberar(self):
+        """La llamada se abandonó sin resultado (p. ej. tarea cancelada): no cuenta como fallo."""
+        with self._lock:
+            self._prueba_en_curso = False
+
+    def estado(self):
+        with self._lock:
+            return {
+                "estado": self._estado,
+                "fallos_consecutivos": self._fallos,
+                "umbral": self.umbral,
+                "reset_segundos": self.reset,
+            }
+
+
+# ===================== SESSION POR PROCESO =====================
+
+_lock = threading.Lock()
+_session = None
+_session_pid = None
+
+
+def get_session():
+    """
+    Session compartida del proceso. Se recrea tras un fork (gunicorn) para
+    no compartir sockets entre workers.
+    """
+    global _session, _session_pid
+    pid = os.getpid()
+    if _session is None or _session_pid != pid:
+        with _lock:
+            if _session is None or _session_pid != pid:
+                s = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=settings.HTTP_POOL_HOSTS,
+                    pool_maxsize=settings.HTTP_POOL_SIZE,
+                    max_retries=0,
+                )
+                s.mount("http://", adapter)
+                s.mount("https://", adapter)
+                _session, _session_pid = s, pid
+    return _session
+
+
+# ===================== CLIENTE POR UPSTREAM =====================
+
+class ClienteHTTP:
+    def __init__(self, nombre, base_url, timeout=None):
+        self.nombre = nombre
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout or (settings.HTTP_CONNECT_TIMEOUT, settings.HTTP_READ_TIMEOUT)
+        self.reintentos = settings.HTTP_REINTENTOS
+        self.backoff = settings.HTTP_BACKOFF
+        self.breaker = CircuitBreaker(
+            nombre, settings.HTTP_BREAKER_UMBRAL, settings.HTTP_BREAKER_RESET
+        )
+        self._stats_lock = threading.Lock()
+        self.stats = {"llamadas": 0, "reintentos": 0, "fallos": 0, "rechazadas": 0}
+
+    def _contar(self, clave):
+        with self._stats_lock:
+            self.stats[clave] += 1
+
+    def _espera(self, intento):
+        # "Full jitter": uniforme entre 0 y backoff * 2^intento.
+        return random.uniform(0, self.backoff * (2 ** intento))
+
+    def request(self, method, path, idempotente=False, **kwargs):
+        """
+        Ejecuta la llamada. Lanza ``CircuitoAbierto`` si el breaker no la
+        permite y ``requests.RequestException`` si todos los intentos fallan.
+        Devuelve la ``Response`` (sin ``raise_for_status``).
+        """
+        with metricas.medir_upstream(self.nombre, path.strip("/")) as m:
+            r = self._request(method, path, idempotente, **kwargs)
+            m.resultado = r.status_code
+            return r
+
+    def _request(self, method, path, idempotente, **kwargs):
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        kwargs.setdefault("timeout", self.timeout)
+        intentos = 1 + (self.reintentos if idempotente else 0)
+
+        for intento in range(intentos):
+            if not self.breaker.permitir():
+                self._contar("rechazadas")
+                raise CircuitoAbierto(f"Circuito abierto para {self.nombre}")
+
+            self._contar("llamadas")
+            try:
+                r = get_session().request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                self.breaker.fallo()
+                self._contar("fallos")
+                if intento + 1 >= intentos:
+                    raise
+            except Exception:
+                # Cualquier otro error (respuesta cortada, body inválido...)
+                # también es un fallo del upstream, sin reintento; sin esto
+                # una prueba en SEMI_ABIERTO quedaría "en curso" para siempre.
+                self.breaker.fallo()
+                self._contar("fallos")
+                raise
+            except BaseException:
+                self.breaker.liberar()
+                raise
+            else:
+                if r.status_code not in STATUS_REINTENTABLES:
+                    self.breaker.exito()
+                    return r
+                self.breaker.fallo()
+                self._contar("fallos")
+                if intento + 1 >= intentos:
+                    return r
+
+            self._contar("reintentos")
+            time.sleep(self._espera(intento))
+
+    def post(self, path, idempotente=False, **kwargs):
+        return self.request("POST", path, idempotente=idempotente, **kwargs)
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, idempotente=True, **kwargs)
+
+    def estado(self):
+        with self._stats_lock:
+            stats = dict(self.stats)
+        return {"base_url": self.base_url, "breaker": self.breaker.estado(), **stats}
+
+
+_clientes = {}
+
+
+def get_cliente(nombre, base_url):
+    """Cliente compartido (y su breaker) para un upstream, uno por proceso."""
+    clave = (nombre, base_url)
+    cliente = _clientes.get(clave)
+    if cliente is None:
+        with _lock:
+            cliente = _clientes.setdefault(clave, ClienteHTTP(nombre, base_url))
+    return cliente
+
+
+# ===================== CLIENTE ASYNC =====================
+
+# Un httpx.AsyncClient (pool de conexiones) por event loop.
+_clientes_httpx = weakref.WeakKeyDictionary()
+
+
+def get_httpx():
+    loop = asyncio.get_running_loop()
+    cliente = _clientes_httpx.get(loop)
+    if cliente is None or cliente.is_closed:
+        cliente = httpx.AsyncClient(
+            timeout=httpx.Timeout(settings.HTTP_READ_TIMEOUT, connect=settings.HTTP_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_POOL_HOSTS * settings.HTTP_POOL_SIZE,
+                max_keepalive_connections=settings.HTTP_POOL_SIZE,
+            ),
+        )
+        _clientes_httpx[loop] = cliente
+    return cliente
+
+
+class ClienteHTTPAsync:
+    """
+    Igual que ``ClienteHTTP`` pero sin bloquear el event loop. Comparte
+    breaker y ``stats`` con el cliente sync del mismo upstream. Lanza
+    ``CircuitoAbierto`` o ``httpx.TransportError``; devuelve ``httpx.Response``.
+    """
+
+    def __init__(self, sync):
+        self.sync = sync
+        self.nombre = sync.nombre
+        self.base_url = sync.base_url
+        self.breaker = sync.breaker
+
+    async def request(self, method, path, idempotente=False, **kwargs):
+        with metricas.medir_upstream(self.nombre, path.strip("/")) as m:
+            r = await self._request(method, path, idempotente, **kwargs)
+            m.resultado = r.status_code
+            return r
+
+    async def _request(self, method, path, idempotente, **kwargs):
+        s = self.sync
+        url = f"{s.base_url}/{path.lstrip('/')}"
+        if "timeout" in kwargs and isinstance(kwargs["timeout"], tuple):
+            conectar, leer = kwargs["timeout"]
+            kwargs["timeout"] = httpx.Timeout(leer, connect=conectar)
+        intentos = 1 + (s.reintentos if idempotente else 0)
+
+        for intento in range(intentos):
+            if not self.breaker.permitir():
+                s._contar("rechazadas")
+                raise CircuitoAbierto(f"Circuito abierto para {self.nombre}")
+
+            s._contar("llamadas")
+            try:
+                r = await get_httpx().request(method, url, **kwargs)
+            except httpx.TransportError:
+                self.breaker.fallo()
+                s._contar("fallos")
+                if intento + 1 >= intentos:
+                    raise
+            except Exception:
+                self.breaker.fallo()
+                s._contar("fallos")
+                raise
+            except BaseException:
+                # CancelledError: la request se abandonó, no es culpa del upstream.
+                self.breaker.liberar()
+                raise
+            else:
+                if r.status_code not in STATUS_REINTENTABLES:
+                    self.breaker.exito()
+                    return r
+                self.breaker.fallo()
+                s._contar("fallos")
+                if intento + 1 >= intentos:
+                    return r
+
+            s._contar("reintentos")
+            await asyncio.sleep(s._espera(intento))
+
+    async def post(self, path, idempotente=False, **kwargs):
+        return await self.request("POST", path, idempotente=idempotente, **kwargs)
+
+    async def get(self, path, **kwargs):
+        return await self.request("GET", path, idempotente=True, **kwargs)
+
+
+def get_cliente_async(nombre, base_url):
+    return ClienteHTTPAsync(get_cliente(nombre, base_url))
+
+
+def _estado_pool():
+    adapter = get_session().get_adapter("http://")
+    pools = []
+    for key in list(adapter.poolmanager.pools.keys()):
+        pool = adapter.poolmanager.pools.get(key)
+        if pool is None:
+            continue
+        pools.append({
+            "host": f"{pool.scheme}://{pool.host}:{pool.port}",
+            "conexiones_creadas": pool.num_connections,
+            "requests": pool.num_requests,
+            "libres": pool.pool.qsize() if pool.pool is not None else 0,
+            "max": settings.HTTP_POOL_SIZE,
+        })
+    return pools
+
+
+def estado_integraciones():
+    return {
+        "pid": os.getpid(),
+        "clientes": {c.nombre: c.estado() for c in list(_clientes.values())},
+        "pool": _estado_pool(),
+    }
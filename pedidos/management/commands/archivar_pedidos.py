@@ -0,0 +1,29 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from pedidos import archivo
+
+
+class Command(BaseCommand):
+    help = "Mueve los pedidos CERRADO/CANCELADO antiguos a la tabla de archivo, en lotes cortos"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--horas", type=float, default=settings.ARCHIVO_HORAS,
+                            help="Antigüedad mínima desde el último cambio del pedido")
+        parser.add_argument("--lote", type=int, default=settings.ARCHIVO_LOTE, help="Pedidos por transacción")
+        parser.add_argument("--pausa", type=float, default=0.05, help="Segundos entre lotes")
+        parser.add_argument("--limite", type=int, help="Máximo de pedidos a mover en esta corrida")
+        parser.add_argument("--simular", action="store_true", help="Solo cuenta los pedidos a mover")
+
+    def handle(self, *args, **opts):
+        antes = timezone.now() - timedelta(hours=opts["horas"])
+        if opts["simular"]:
+            self.stdout.write(f"{archivo.pendientes(antes)} pedidos por archivar")
+            return
+        inicio = time.perf_counter()
+        movidos = archivo.archivar(antes, opts["lote"], opts["pausa"], opts["limite"])
+        self.stdout.write(f"{movidos} pedidos archivados en {time.perf_counter() - inicio:.1f}s")
@@ -0,0 +1,222 @@
+import json
+import math
+import random
+import subprocess
+import threading
+import time
+from collections import Counter, defaultdict
+
+import requests
+from django.core.management.base import BaseCommand
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.test.utils import override_settings
+
+from mock import inventario
+from mock.views import MENU
+from pedidos import estadisticas, outbox
+from pedidos.models import EventoPedido, MensajeOutbox, Pedido
+
+CLIENTE = "bench-carga"
+
+# Pasos de un mesero por pedido: (endpoint, método, ruta).
+_FLUJO = [
+    ("confirmar", "POST", "/api/pedidos/{id}/confirmar/"),
+    ("listo", "PATCH", "/api/pedidos/{id}/listo/"),
+    ("entregar", "PATCH", "/api/pedidos/{id}/entregar/"),
+    ("cerrar", "PATCH", "/api/pedidos/{id}/cerrar/"),
+]
+
+
+class _Silencioso(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class _Registro:
+    """Latencias y códigos de estado por endpoint, compartido entre hilos."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencias = defaultdict(list)
+        self.codigos = defaultdict(Counter)
+        self.ciclos = 0
+
+    def medir(self, endpoint, session, method, url, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            r = session.request(method, url, timeout=30, **kwargs)
+            codigo = str(r.status_code)
+        except requests.RequestException as e:
+            r, codigo = None, type(e).__name__
+        with self._lock:
+            self.latencias[endpoint].append(time.perf_counter() - inicio)
+            self.codigos[endpoint][codigo] += 1
+        return r
+
+    def ciclo(self):
+        with self._lock:
+            self.ciclos += 1
+
+
+def _percentil(orden, p):
+    # Nearest-rank sobre la lista ya ordenada.
+    return orden[max(0, min(len(orden) - 1, math.ceil(p / 100 * len(orden)) - 1))]
+
+
+def _mesero(base, fin, registro):
+    s = requests.Session()
+    platos = [p["id"] for p in MENU]
+    while time.monotonic() < fin:
+        body = {"mesa": random.randint(1, 20), "cliente": CLIENTE, "plato": random.choice(platos)}
+        r = registro.medir("crear", s, "POST", f"{base}/api/pedidos/", json=body)
+        if r is None or r.status_code != 201:
+            continue
+        pid = r.json()["id"]
+        for endpoint, method, ruta in _FLUJO:
+            r = registro.medir(endpoint, s, method, base + ruta.format(id=pid))
+            if r is None or r.status_code != 200:
+                break
+        else:
+            registro.ciclo()
+
+
+def _cocina(base, fin, intervalo, registro):
+    # Como la pantalla de cocina: GET condicional con el último ETag.
+    s = requests.Session()
+    etag = None
+    while time.monotonic() < fin:
+        headers = {"If-None-Match": etag} if etag else {}
+        r = registro.medir("cocina_lista", s, "GET", f"{base}/api/cocina/lista/", headers=headers)
+        if r is not None and r.status_code == 200:
+            etag = r.headers.get("ETag")
+        if intervalo:
+            time.sleep(intervalo)
+
+
+def _despachador(fin):
+    # Solo el outbox de los pedidos de la prueba: los pendientes reales de
+    # la base quedan para su despachador (y con M1/M4 de verdad).
+    propios = Pedido.objects.filter(cliente=CLIENTE).values("id")
+    try:
+        while time.monotonic() < fin:
+            if not outbox.despachar_lote(pedidos=propios):
+                time.sleep(0.05)
+    finally:
+        connection.close()
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de carga: meseros (crear, confirmar, listo, entregar, cerrar) y "
+        "pantallas de cocina (cocina_lista) contra el URLconf real y el mock M1/M4. "
+        "Reporta throughput y p50/p95/p99 por endpoint en JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--meseros", type=int, default=8, help="Hilos que hacen el flujo completo")
+        parser.add_argument("--cocinas", type=int, default=4, help="Pantallas de cocina consultando la cola")
+        parser.add_argument("--intervalo-cocina", type=float, default=1.0,
+                            help="Segundos entre consultas de cada pantalla (0 = sin pausa)")
+        parser.add_argument("--segundos", type=float, default=10)
+        parser.add_argument("--url", help="Servidor ya levantado (p. ej. gunicorn); por defecto uno local")
+        parser.add_argument("--sin-outbox", action="store_true",
+                            help="No despachar el outbox a M1/M4 durante la prueba")
+        parser.add_argument("--stock", type=int, default=1_000_000,
+                            help="Stock por ingrediente del mock de M1 durante la prueba")
+        parser.add_argument("--salida", help="Archivo donde guardar el JSON (además de stdout)")
+        parser.add_argument("--conservar", action="store_true", help="No borrar los pedidos creados")
+
+    def handle(self, *args, **opts):
+        servidor = None
+        base = (opts["url"] or "").rstrip("/")
+        if not base:
+            servidor = ThreadedWSGIServer(("127.0.0.1", 0), _Silencioso)
+            servidor.set_app(get_wsgi_application())
+            threading.Thread(target=servidor.serve_forever, daemon=True).start()
+            base = f"http://127.0.0.1:{servidor.server_port}"
+
+        despachar = not opts["sin_outbox"] and servidor is not None
+        mock = f"{base}/mock"
+        try:
+            with override_settings(M1_BASE_URL=mock, M4_BASE_URL=mock):
+                if despachar:
+                    inventario.reponer({n: opts["stock"] for n in inventario.INVENTARIO_INICIAL})
+                reporte = self._correr(base, opts, despachar)
+        finally:
+            if servidor is not None:
+                servidor.shutdown()
+                servidor.server_close()
+
+        salida = json.dumps(reporte, indent=2, ensure_ascii=False)
+        self.stdout.write(salida)
+        if opts["salida"]:
+            with open(opts["salida"], "w", encoding="utf-8") as f:
+                f.write(salida + "\n")
+
+        if servidor is not None and not opts["conservar"]:
+            self._limpiar(despachar)
+
+    def _correr(self, base, opts, despachar):
+        registro = _Registro()
+        fin = time.monotonic() + opts["segundos"]
+        hilos = [threading.Thread(target=_mesero, args=(base, fin, registro)) for _ in range(opts["meseros"])]
+        hilos += [
+            threading.Thread(target=_cocina, args=(base, fin, opts["intervalo_cocina"], registro))
+            for _ in range(opts["cocinas"])
+        ]
+        if despachar:
+            hilos.append(threading.Thread(target=_despachador, args=(fin,)))
+
+        inicio = time.monotonic()
+        for t in hilos:
+            t.start()
+        for t in hilos:
+            t.join()
+        duracion = time.monotonic() - inicio
+
+        endpoints = {}
+        for endpoint, latencias in sorted(registro.latencias.items()):
+            orden = sorted(latencias)
+            endpoints[endpoint] = {
+                "requests": len(orden),
+                "rps": round(len(orden) / duracion, 1),
+                "p50_ms": round(_percentil(orden, 50) * 1000, 2),
+                "p95_ms": round(_percentil(orden, 95) * 1000, 2),
+                "p99_ms": round(_percentil(orden, 99) * 1000, 2),
+                "codigos": dict(registro.codigos[endpoint]),
+            }
+        total = sum(e["requests"] for e in endpoints.values())
+        return {
+            "commit": _commit(),
+            "config": {
+                "url": opts["url"] or "local", "meseros": opts["meseros"], "cocinas": opts["cocinas"],
+                "intervalo_cocina": opts["intervalo_cocina"], "outbox": despachar,
+                "db": connection.vendor,
+            },
+            "segundos": round(duracion, 2),
+            "requests": total,
+            "rps": round(total / duracion, 1),
+            "pedidos_cerrados": registro.ciclos,
+            "outbox": outbox.estado() if despachar else None,
+            "endpoints": endpoints,
+        }
+
+    def _limpiar(self, despachar):
+        ids = Pedido.objects.filter(cliente=CLIENTE).values_list("id", flat=True)
+        estadisticas.descontar(ids)
+        EventoPedido.objects.filter(pedido_id__in=ids).delete()
+        MensajeOutbox.objects.filter(pedido_id__in=ids).delete()
+        Pedido.objects.filter(cliente=CLIENTE).delete()
+        if despachar:
+            inventario.reponer()
@@ -0,0 +1,116 @@
+import multiprocessing
+import statistics
+import threading
+import time
+
+import django
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection, connections
+
+# Sin imports de modelos a nivel de módulo: con "spawn" (Windows, macOS) el
+# hijo importa este módulo antes de ``django.setup()``.
+CLIENTE = "bench-escrituras"
+
+
+def _hilo(fin, latencias, errores):
+    from pedidos import services
+
+    # Un ciclo = 3 transacciones de escritura (alta, confirmar, listo),
+    # como hace un mesero y la cocina con cada pedido.
+    try:
+        while time.monotonic() < fin:
+            inicio = time.perf_counter()
+            try:
+                p = services.crear_pedido(mesa=1, cliente=CLIENTE, plato="HOTDOG")
+                services.confirmar(p.id)
+                services.marcar_listo(p.id)
+            except DatabaseError as e:
+                errores.append(str(e))
+                continue
+            latencias.append((time.perf_counter() - inicio) / 3)
+    finally:
+        connection.close()
+
+
+def _proceso(segundos, hilos, cola):
+    if not apps.ready:
+        django.setup()
+    fin = time.monotonic() + segundos
+    latencias, errores = [], []
+    threads = [threading.Thread(target=_hilo, args=(fin, latencias, errores)) for _ in range(hilos)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    cola.put((latencias, errores))
+
+
+class Command(BaseCommand):
+    help = "Mide el throughput de escrituras de pedidos con varios procesos/hilos concurrentes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--procesos", type=int, default=3, help="Como los workers de gunicorn")
+        parser.add_argument("--hilos", type=int, default=8, help="Hilos por proceso")
+        parser.add_argument("--segundos", type=float, default=10)
+        parser.add_argument("--conservar", action="store_true", help="No borrar los pedidos creados")
+
+    def handle(self, *args, **opts):
+        self.stdout.write(f"Perfil: {self._perfil()}")
+
+        # Los hijos no deben heredar la conexión abierta del padre.
+        connections.close_all()
+        metodo = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+        ctx = multiprocessing.get_context(metodo)
+        cola = ctx.Queue()
+        procesos = [
+            ctx.Process(target=_proceso, args=(opts["segundos"], opts["hilos"], cola))
+            for _ in range(opts["procesos"])
+        ]
+        inicio = time.monotonic()
+        for p in procesos:
+            p.start()
+        resultados = [cola.get() for _ in procesos]
+        for p in procesos:
+            p.join()
+        duracion = time.monotonic() - inicio
+
+        latencias = sorted(l for r in resultados for l in r[0])
+        errores = [e for r in resultados for e in r[1]]
+        transacciones = len(latencias) * 3
+        self.stdout.write(
+            f"procesos={opts['procesos']} hilos={opts['hilos']} segundos={duracion:.1f}\n"
+            f"transacciones={transacciones} tx/s={transacciones / duracion:.1f} "
+            f"errores={len(errores)}"
+        )
+        if latencias:
+            p95 = latencias[int(len(latencias) * 0.95) - 1] if len(latencias) >= 20 else latencias[-1]
+            self.stdout.write(
+                f"latencia por transacción: p50={statistics.median(latencias) * 1000:.1f}ms "
+                f"p95={p95 * 1000:.1f}ms"
+            )
+        if errores:
+            self.stdout.write(f"primer error: {errores[0]}")
+
+        if not opts["conservar"]:
+            self._limpiar()
+
+    def _perfil(self):
+        if connection.vendor != "sqlite":
+            return f"{connection.vendor} (CONN_MAX_AGE={connection.settings_dict['CONN_MAX_AGE']})"
+        with connection.cursor() as c:
+            valores = {
+                p: c.execute(f"PRAGMA {p}").fetchone()[0]
+                for p in ("journal_mode", "synchronous", "busy_timeout", "mmap_size")
+            }
+        return "sqlite " + " ".join(f"{k}={v}" for k, v in valores.items())
+
+    def _limpiar(self):
+        from pedidos import estadisticas
+        from pedidos.models import EventoPedido, MensajeOutbox, Pedido
+
+        ids = Pedido.objects.filter(cliente=CLIENTE).values_list("id", flat=True)
+        estadisticas.descontar(ids)
+        EventoPedido.objects.filter(pedido_id__in=ids).delete()
+        MensajeOutbox.objects.filter(pedido_id__in=ids).delete()
+        Pedido.objects.filter(cliente=CLIENTE).delete()
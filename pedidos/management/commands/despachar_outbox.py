@@ -0,0 +1,48 @@
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, close_old_connections
+
+from pedidos import metricas, outbox
+
+
+class Command(BaseCommand):
+    help = "Entrega a M1/M4 los mensajes del outbox (worker de larga duración)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--una-vez", action="store_true", help="Procesa lo pendiente y termina")
+        parser.add_argument("--lote", type=int, default=settings.OUTBOX_LOTE)
+
+    def handle(self, *args, **opts):
+        detener = threading.Event()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, lambda *_: detener.set())
+
+        while not detener.is_set():
+            try:
+                procesados = outbox.despachar_lote(opts["lote"])
+            except DatabaseError as e:
+                self.stderr.write(f"Error de base: {e}")
+                procesados = 0
+            finally:
+                close_old_connections()
+
+            if procesados:
+                self.stdout.write(self._resumen(procesados))
+            elif opts["una_vez"]:
+                break
+            else:
+                detener.wait(settings.OUTBOX_POLL_SEGUNDOS)
+        # Lo último que midió este proceso (llamadas a M1/M4) para /metrics.
+        metricas.volcar()
+
+    def _resumen(self, procesados):
+        s = outbox.stats
+        total = s["enviados"] + s["fallidos"] + s["descartados"] + s["reintentos"]
+        media = s["segundos"] / total * 1000 if total else 0
+        return (
+            f"lote={procesados} enviados={s['enviados']} reintentos={s['reintentos']} "
+            f"fallidos={s['fallidos']} descartados={s['descartados']} ms_medio={media:.1f}"
+        )
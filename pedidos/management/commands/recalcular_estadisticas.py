@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from pedidos import estadisticas
+
+
+class Command(BaseCommand):
+    help = "Rehace las estadísticas por hora y plato desde los pedidos y su log de eventos"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=2000, help="Pedidos leídos por consulta")
+
+    def handle(self, *args, **opts):
+        inicio = time.perf_counter()
+        filas = estadisticas.recalcular(opts["lote"])
+        self.stdout.write(f"{filas} filas de estadísticas en {time.perf_counter() - inicio:.1f}s")
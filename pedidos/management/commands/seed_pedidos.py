@@ -1,14 +1,216 @@
-from django.core.management.base import BaseCommand
+import random
+import time
+import uuid
+from bisect import bisect
+from collections import Counter
+from datetime import datetime, timedelta, timezone as tz
+from itertools import accumulate
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connections, models, transaction
+from django.utils import timezone
+
+from pedidos import estadisticas
 from pedidos.models import Pedido
 
-class Command(BaseCommand):
-    help = "Crea pedidos de ejemplo"
+Estado = Pedido.Estado
+
+ESTADOS = "CREADO=4,EN_PREPARACION=4,LISTO=2,ENTREGADO=2,CERRADO=75,CANCELADO=13"
+# Los del menú del mock de M1 (``mock.views.MENU``), sin depender de esa app.
+PLATOS = "HAMB_CARNE,HAMB_POLLO,FIDEOS_CARNE,FIDEOS_POLLO,ENSALADA,HOTDOG"
+CLIENTES = ["Juan", "María", "Ana", "Luis", "Pedro", "Camila", "Diego", "Valentina", None]
+_COLUMNAS = ("id", "mesa", "cliente", "plato", "estado", "creado_en", "actualizado_en", "entregado_en")
+
+
+def _pesos(texto, validos, opcion):
+    """``"A=3,B=1"`` -> ``(["A", "B"], [3.0, 4.0])``: pesos acumulados; sin ``=`` vale 1."""
+    nombres, pesos = [], []
+    for parte in filter(None, (p.strip() for p in texto.split(","))):
+        nombre, _, peso = parte.partition("=")
+        nombre = nombre.strip()
+        if validos is not None and nombre not in validos:
+            raise CommandError(f"{opcion}: valor inválido {nombre!r}.")
+        try:
+            pesos.append(float(peso) if peso else 1.0)
+        except ValueError:
+            raise CommandError(f"{opcion}: peso inválido {peso!r}.")
+        if pesos[-1] < 0:
+            raise CommandError(f"{opcion}: peso negativo {peso!r}.")
+        nombres.append(nombre)
+    if not nombres or sum(pesos) <= 0:
+        raise CommandError(f"{opcion}: indique al menos un valor con peso positivo.")
+    return nombres, list(accumulate(pesos))
+
+
+def _rango(texto):
+    try:
+        desde, _, hasta = texto.partition("-")
+        desde, hasta = int(desde), int(hasta or desde)
+    except ValueError:
+        raise CommandError("--mesas: use N o N-M.")
+    if desde > hasta:
+        raise CommandError("--mesas: rango vacío.")
+    return desde, hasta
+
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+# Atajos equivalentes a ``get_db_prep_save`` para los valores que genera
+# este comando, sin su costo por valor (millones de llamadas).
+
+def _fecha_sqlite(segundos, db):
+    # SQLite guarda texto UTC sin zona.
+    return str(_EPOCH + timedelta(seconds=segundos))
+
 
-    def handle(self, *args, **kwargs):
-        data = [
-            {"mesa": "A1", "cliente": "Juan"},
-            {"mesa": "B7", "cliente": "María"},
+def _uuid_hex(valor, db):
+    # Bases sin tipo UUID: char(32) con el hex.
+    return valor.hex
+
+
+def _fecha(campo):
+    return lambda segundos, db: campo.get_db_prep_save(datetime.fromtimestamp(segundos, tz.utc), db)
+
+
+class _Generador:
+    """
+    Filas de pedidos con un ``random.Random`` propio: la misma semilla da
+    los mismos pedidos (ids incluidos). Los terminados se reparten en todo
+    el período; los activos son de las últimas dos horas, como en servicio.
+    Las fechas salen en segundos epoch (UTC); ``_cargar`` las convierte.
+    """
+
+    def __init__(self, semilla, estados, platos, mesas, dias, ahora):
+        self.rng = random.Random(semilla)
+        self.estados, self.platos, self.mesas = estados, platos, mesas
+        self.ahora = ahora.timestamp()
+        self.periodo = dias * 86400
+        self.reciente = min(self.periodo, 2 * 3600)
+
+    def fila(self):
+        azar = self.rng.random
+        nombres, acumulados = self.estados
+        estado = nombres[bisect(acumulados, azar() * acumulados[-1])]
+        terminal = estado in Pedido.ESTADOS_TERMINALES
+        creado = self.ahora - azar() * (self.periodo if terminal else self.reciente)
+        entregado = None
+        if estado in (Estado.ENTREGADO, Estado.CERRADO):
+            entregado = min(creado + 600 + azar() * 1800, self.ahora)
+        if estado == Estado.CREADO:
+            actualizado = creado
+        else:
+            actualizado = min((entregado or creado) + 60 + azar() * 3540, self.ahora)
+        desde, hasta = self.mesas
+        platos, pesos = self.platos
+        return [
+            uuid.UUID(int=self.rng.getrandbits(128), version=4),
+            desde + int(azar() * (hasta - desde + 1)),
+            CLIENTES[int(azar() * len(CLIENTES))],
+            platos[bisect(pesos, azar() * pesos[-1])],
+            estado,
+            creado,
+            actualizado,
+            entregado,
         ]
-        for d in data:
-            obj, created = Pedido.objects.get_or_create(mesa=d["mesa"], cliente=d["cliente"])
-            self.stdout.write(f"{'CREADO' if created else 'EXISTE'}: {obj.id} {obj.mesa} {obj.cliente}")
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera pedidos de prueba en volumen (millones) con distribución configurable "
+        "de estados, platos, mesas y fechas, y semilla fija. Reporta filas/s."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cantidad", type=int, default=1000)
+        parser.add_argument("--lote", type=int, default=10_000, help="Filas por INSERT/transacción")
+        parser.add_argument("--semilla", type=int, default=1, help="Misma semilla, mismos pedidos")
+        parser.add_argument("--estados", default=ESTADOS, help="Pesos por estado: CERRADO=75,CANCELADO=13,...")
+        parser.add_argument("--platos", default=PLATOS,
+                            help="Pesos por plato: HOTDOG=3,ENSALADA=1 (sin peso = 1)")
+        parser.add_argument("--mesas", default="1-40", help="Rango de mesas: N-M")
+        parser.add_argument("--dias", type=float, default=30, help="Período hacia atrás desde ahora")
+        # Crear un índice sobre la tabla ya llena es mucho más rápido que
+        # mantenerlo fila a fila, pero mientras tanto las consultas de quien
+        # use la base no tienen índices: solo a pedido.
+        parser.add_argument("--recrear-indices", action="store_true",
+                            help="Borrar los índices de pedidos durante la carga y recrearlos al final "
+                                 "(más rápido para millones de filas; no usar con el servicio en uso)")
+
+    def handle(self, *args, **opts):
+        if opts["cantidad"] < 0 or opts["lote"] < 1 or opts["dias"] <= 0:
+            raise CommandError("--cantidad, --lote y --dias deben ser positivos.")
+        generador = _Generador(
+            opts["semilla"],
+            _pesos(opts["estados"], set(Estado.values), "--estados"),
+            _pesos(opts["platos"], None, "--platos"),
+            _rango(opts["mesas"]),
+            opts["dias"],
+            timezone.now(),
+        )
+
+        db = connections[DEFAULT_DB_ALIAS]
+        recrear = opts["recrear_indices"]
+        inicio = time.perf_counter()
+        if recrear:
+            self._indices(db, "remove_index")
+        try:
+            creados = self._cargar(db, generador, opts)
+        except IntegrityError:
+            raise CommandError("Ya existen pedidos generados con esta semilla; use otra --semilla.")
+        finally:
+            if recrear:
+                self._indices(db, "add_index")
+        segundos = time.perf_counter() - inicio
+        self.stdout.write(
+            f"{creados} pedidos en {segundos:.1f}s ({creados / segundos if segundos else 0:,.0f} filas/s)"
+        )
+
+    def _indices(self, db, operacion):
+        with db.schema_editor() as editor:
+            for indice in Pedido._meta.indexes:
+                getattr(editor, operacion)(Pedido, indice)
+
+    def _cargar(self, db, generador, opts):
+        # INSERT directo y no bulk_create: ``auto_now``/``auto_now_add``
+        # pisarían las fechas generadas, y para millones de filas armar
+        # instancias del modelo cuesta más que el propio INSERT. Solo ids y
+        # fechas necesitan convertirse al valor de la base.
+        # Sin ``EventoPedido``: las altas se suman a ``EstadisticaHora`` en la
+        # misma transacción, pero no hay transiciones en el log (cancelados y
+        # tiempos de preparación quedan en cero, también al recalcular).
+        meta = Pedido._meta
+        qn = db.ops.quote_name
+        campos = [meta.get_field(c) for c in _COLUMNAS]
+        sql = (
+            f"INSERT INTO {qn(meta.db_table)} ({', '.join(qn(f.column) for f in campos)}) "
+            f"VALUES ({', '.join(['%s'] * len(campos))})"
+        )
+        convertir = []
+        for i, f in enumerate(campos):
+            if isinstance(f, models.DateTimeField):
+                rapido = db.vendor == "sqlite" and settings.USE_TZ
+                convertir.append((i, _fecha_sqlite if rapido else _fecha(f)))
+            elif isinstance(f, models.UUIDField):
+                convertir.append((i, f.get_db_prep_save if db.features.has_native_uuid_field else _uuid_hex))
+        creados = 0
+        while creados < opts["cantidad"]:
+            n = min(opts["lote"], opts["cantidad"] - creados)
+            # Ordenadas por id, las inserciones en la clave primaria quedan juntas.
+            filas = sorted((generador.fila() for _ in range(n)), key=lambda f: f[0].int)
+            altas = Counter((int(f[5] // 3600), f[3]) for f in filas)
+            for fila in filas:
+                for i, preparar in convertir:
+                    if fila[i] is not None:
+                        fila[i] = preparar(fila[i], db)
+            with transaction.atomic(using=db.alias), db.cursor() as c:
+                c.executemany(sql, filas)
+                estadisticas.acumular_altas({
+                    (datetime.fromtimestamp(hora * 3600, tz.utc), plato): n
+                    for (hora, plato), n in altas.items()
+                })
+            creados += n
+            if opts["verbosity"] > 1:
+                self.stdout.write(f"{creados}/{opts['cantidad']}")
+        return creados
@@ -0,0 +1,320 @@
+"""
+Métricas en formato de texto de Prometheus (``GET /metrics``).
+
+Cada proceso acumula en memoria contadores e histogramas y un hilo de fondo
+los escribe cada ``METRICAS_VOLCADO_SEGUNDOS`` en ``METRICAS_DIR/<pid>-<token>.json``
+(reemplazo atómico), solo si cambiaron; el token evita que un pid reutilizado
+pise el archivo de un proceso anterior. ``/metrics`` suma los archivos de todos
+los procesos (workers de gunicorn, despachador del outbox), así que responda el
+worker que responda, el total es el de todo el despliegue. Al sumar, los
+archivos de procesos que ya terminaron se funden en ``acumulado.json`` y se
+borran: los contadores no bajan y el directorio no crece con cada reinicio de
+worker. La fusión necesita ``fcntl`` y ver los pids (mismo host); en Windows
+los archivos se conservan.
+
+Qué se mide:
+- ``http_request_duration_seconds``: latencia por vista, método y código
+  (``MetricasMiddleware``).
+- ``http_request_db_queries`` / ``http_request_db_seconds``: consultas SQL y
+  tiempo en la base por request.
+- ``upstream_request_duration_seconds``: llamadas a M1/M4 (``pedidos.http``)
+  y descargas de catálogos (``ui.catalogos``), por resultado.
+- ``pedidos_transiciones_total``: cambios de estado confirmados, por tipo y
+  estado (``eventos.registrar``).
+"""
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows: sin fusión de archivos
+    fcntl = None
+
+log = logging.getLogger(__name__)
+
+_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# nombre -> (tipo, ayuda, buckets)
+METRICAS = {
+    "http_request_duration_seconds": ("histogram", "Latencia de las requests por vista.", _LATENCIA),
+    "http_request_db_queries": ("histogram", "Consultas SQL por request.", (0, 1, 2, 5, 10, 20, 50, 100)),
+    "http_request_db_seconds": ("histogram", "Tiempo en la base por request.", _LATENCIA),
+    "upstream_request_duration_seconds": (
+        "histogram", "Llamadas a módulos externos (M1, M4, catálogos).", _LATENCIA,
+    ),
+    "pedidos_transiciones_total": ("counter", "Cambios de estado de pedidos confirmados.", None),
+}
+
+_lock = threading.Lock()
+_pid = None
+_token = None
+_contadores = {}
+_histogramas = {}
+_sucio = False
+
+
+def _estado():
+    # Tras un fork (gunicorn) el hijo no debe volver a contar lo del padre.
+    global _pid, _token, _contadores, _histogramas, _sucio
+    if _pid != os.getpid():
+        _pid, _contadores, _histogramas = os.getpid(), {}, {}
+        _token = uuid.uuid4().hex[:8]
+        threading.Thread(target=_volcador, args=(_pid,), daemon=True, name="metricas").start()
+    _sucio = True
+
+
+def _volcador(pid):
+    while _pid == pid:
+        time.sleep(settings.METRICAS_VOLCADO_SEGUNDOS)
+        if _sucio:
+            try:
+                volcar()
+            except OSError as e:
+                log.warning("No se pudieron volcar las métricas: %s", e)
+
+
+def _clave(nombre, labels):
+    return nombre, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def incrementar(nombre, n=1, **labels):
+    with _lock:
+        _estado()
+        clave = _clave(nombre, labels)
+        _contadores[clave] = _contadores.get(clave, 0) + n
+
+
+def observar(nombre, valor, **labels):
+    buckets = METRICAS[nombre][2]
+    with _lock:
+        _estado()
+        clave = _clave(nombre, labels)
+        h = _histogramas.get(clave)
+        if h is None:
+            h = _histogramas[clave] = [[0] * len(buckets), 0.0, 0]
+        for i, limite in enumerate(buckets):
+            if valor <= limite:
+                h[0][i] += 1
+                break
+        h[1] += valor
+        h[2] += 1
+
+
+# ===================== CONSULTAS SQL POR REQUEST =====================
+
+# ``[consultas, segundos]`` de la request en curso. Es una variable de
+# contexto y no un atributo del hilo: las vistas async corren la consulta en
+# otro hilo (``pedidos.asincrono``) con una copia del contexto.
+_consultas = contextvars.ContextVar("metricas_consultas", default=None)
+
+
+def medir_consulta(execute, sql, params, many, context):
+    """``execute_wrapper`` que se instala en cada conexión (ver ``apps``)."""
+    acumulado = _consultas.get()
+    if acumulado is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        acumulado[0] += 1
+        acumulado[1] += time.perf_counter() - inicio
+
+
+def empezar_request():
+    return time.perf_counter(), _consultas.set([0, 0.0])
+
+
+def terminar_request(request, response, inicio, token):
+    consultas, segundos_db = _consultas.get()
+    _consultas.reset(token)
+    match = getattr(request, "resolver_match", None)
+    vista = match.view_name if match else "sin_ruta"
+    observar(
+        "http_request_duration_seconds", time.perf_counter() - inicio,
+        vista=vista, metodo=request.method, codigo=response.status_code,
+    )
+    observar("http_request_db_queries", consultas, vista=vista)
+    observar("http_request_db_seconds", segundos_db, vista=vista)
+
+
+class medir_upstream:
+    """
+    ``with medir_upstream("m1", "stock/validar-reservar") as m: ...``
+    Quien llama fija ``m.resultado`` (p. ej. el código HTTP); si sale por
+    excepción el resultado es el nombre de la excepción.
+    """
+
+    def __init__(self, upstream, operacion):
+        self.labels = {"upstream": upstream, "operacion": operacion}
+        self.resultado = "ok"
+
+    def __enter__(self):
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, exc, tb):
+        resultado = tipo.__name__ if tipo is not None else self.resultado
+        observar(
+            "upstream_request_duration_seconds", time.perf_counter() - self._inicio,
+            resultado=resultado, **self.labels,
+        )
+        return False
+
+
+# ===================== VOLCADO Y EXPOSICIÓN =====================
+
+_ACUMULADO = "acumulado.json"
+
+
+def _directorio():
+    return Path(settings.METRICAS_DIR)
+
+
+def _datos(contadores, histogramas):
+    return {
+        "contadores": [[n, list(l), v] for (n, l), v in contadores.items()],
+        "histogramas": [[n, list(l), h[0][:], h[1], h[2]] for (n, l), h in histogramas.items()],
+    }
+
+
+def _escribir(directorio, nombre, datos):
+    tmp = directorio / f".{os.getpid()}.{threading.get_ident()}.tmp"
+    tmp.write_text(json.dumps(datos))
+    os.replace(tmp, directorio / nombre)
+
+
+def volcar():
+    """Escribe las métricas de este proceso en su archivo."""
+    global _sucio
+    with _lock:
+        if _pid != os.getpid():
+            return
+        _sucio = False
+        datos = _datos(_contadores, _histogramas)
+    directorio = _directorio()
+    directorio.mkdir(parents=True, exist_ok=True)
+    _escribir(directorio, f"{_pid}-{_token}.json", datos)
+
+
+@contextmanager
+def _bloqueo(directorio):
+    """Exclusión entre procesos para fundir y leer (no-op sin ``fcntl``)."""
+    if fcntl is None:
+        yield
+        return
+    directorio.mkdir(parents=True, exist_ok=True)
+    with open(directorio / ".lock", "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _terminados(directorio):
+    """Archivos de procesos que ya no existen (``<pid>-<token>.json`` o ``<pid>.json``)."""
+    if fcntl is None:
+        return []
+    muertos = []
+    for archivo in directorio.glob("*.json"):
+        pid = archivo.stem.partition("-")[0]
+        if pid.isdigit() and int(pid) != os.getpid() and not _vivo(int(pid)):
+            muertos.append(archivo)
+    return muertos
+
+
+def _fundir(directorio, archivos):
+    """Suma ``archivos`` a ``acumulado.json`` y los borra (con el bloqueo tomado)."""
+    acumulado = directorio / _ACUMULADO
+    contadores, histogramas = _leer([acumulado, *archivos])
+    _escribir(directorio, _ACUMULADO, _datos(contadores, histogramas))
+    for archivo in archivos:
+        archivo.unlink(missing_ok=True)
+
+
+def _leer(archivos):
+    contadores, histogramas = {}, {}
+    for archivo in archivos:
+        try:
+            datos = json.loads(archivo.read_text())
+        except (OSError, ValueError):
+            continue
+        for n, l, v in datos.get("contadores", []):
+            if n not in METRICAS:
+                continue
+            clave = (n, tuple(tuple(x) for x in l))
+            contadores[clave] = contadores.get(clave, 0) + v
+        for n, l, buckets, suma, cuenta in datos.get("histogramas", []):
+            if n not in METRICAS or len(buckets) != len(METRICAS[n][2]):
+                continue
+            clave = (n, tuple(tuple(x) for x in l))
+            h = histogramas.setdefault(clave, [[0] * len(buckets), 0.0, 0])
+            h[0] = [a + b for a, b in zip(h[0], buckets)]
+            h[1] += suma
+            h[2] += cuenta
+    return contadores, histogramas
+
+
+def _sumar():
+    directorio = _directorio()
+    with _bloqueo(directorio):
+        muertos = _terminados(directorio)
+        if muertos:
+            _fundir(directorio, muertos)
+        return _leer(directorio.glob("*.json"))
+
+
+def _labels(pares):
+    if not pares:
+        return ""
+    escapar = lambda v: v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{escapar(v)}"' for k, v in pares) + "}"
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def exponer():
+    """Texto de exposición de Prometheus con la suma de todos los procesos."""
+    volcar()
+    contadores, histogramas = _sumar()
+    lineas = []
+    for nombre, (tipo, ayuda, buckets) in METRICAS.items():
+        lineas += [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} {tipo}"]
+        if tipo == "counter":
+            for (n, pares), valor in sorted(contadores.items()):
+                if n == nombre:
+                    lineas.append(f"{nombre}{_labels(pares)} {_numero(valor)}")
+            continue
+        for (n, pares), (cuentas, suma, cuenta) in sorted(histogramas.items()):
+            if n != nombre:
+                continue
+            acumulado = 0
+            for limite, c in zip(buckets, cuentas):
+                acumulado += c
+                lineas.append(f"{nombre}_bucket{_labels(pares + (('le', _numero(float(limite))),))} {acumulado}")
+            lineas.append(f"{nombre}_bucket{_labels(pares + (('le', '+Inf'),))} {cuenta}")
+            lineas.append(f"{nombre}_sum{_labels(pares)} {_numero(suma)}")
+            lineas.append(f"{nombre}_count{_labels(pares)} {cuenta}")
+    return "\n".join(lineas) + "\n"
@@ -0,0 +1,34 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from . import metricas
+
+
+class MetricasMiddleware:
+    """
+    Latencia, consultas SQL y tiempo en la base de cada request (ver
+    ``pedidos.metricas``). Va primero en ``MIDDLEWARE`` para medir todo.
+    Funciona bajo WSGI y ASGI sin forzar cambios de hilo.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.es_async = iscoroutinefunction(get_response)
+        if self.es_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.es_async:
+            return self.__acall__(request)
+        inicio, token = metricas.empezar_request()
+        response = self.get_response(request)
+        metricas.terminar_request(request, response, inicio, token)
+        return response
+
+    async def __acall__(self, request):
+        inicio, token = metricas.empezar_request()
+        response = await self.get_response(request)
+        metricas.terminar_request(request, response, inicio, token)
+        return response
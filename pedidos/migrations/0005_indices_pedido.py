@@ -0,0 +1,44 @@
+# Generated by Django 5.2.8 on 2026-10-16 22:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0004_alter_pedido_cliente_alter_pedido_mesa_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pedido',
+            name='cliente',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AlterField(
+            model_name='pedido',
+            name='mesa',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='pedido',
+            name='plato',
+            field=models.CharField(blank=True, default='', max_length=60),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['estado', 'creado_en'], name='pedido_estado_creado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(condition=models.Q(('estado__in', ['CANCELADO', 'CERRADO']), _negated=True), fields=['creado_en'], name='pedido_activos_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['mesa', 'creado_en'], name='pedido_mesa_creado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['creado_en', 'id'], name='pedido_creado_id_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-16 22:46
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0005_indices_pedido'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoPedido',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('pedido_id', models.UUIDField(db_index=True)),
+                ('tipo', models.CharField(choices=[('creado', 'Creado'), ('transicion', 'Transición'), ('eliminado', 'Eliminado')], max_length=12)),
+                ('estado', models.CharField(choices=[('CREADO', 'Creado'), ('EN_PREPARACION', 'En preparación'), ('LISTO', 'Listo'), ('ENTREGADO', 'Entregado'), ('CERRADO', 'Cerrado'), ('CANCELADO', 'Cancelado')], max_length=20)),
+                ('creado_en', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+    ]
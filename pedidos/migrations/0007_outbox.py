@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-16 22:52
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0006_evento_pedido'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MensajeOutbox',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('pedido_id', models.UUIDField(db_index=True)),
+                ('destino', models.CharField(max_length=10)),
+                ('operacion', models.CharField(max_length=40)),
+                ('payload', models.JSONField(default=dict)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('enviado', 'Enviado'), ('fallido', 'Fallido'), ('descartado', 'Descartado')], default='pendiente', max_length=12)),
+                ('intentos', models.PositiveIntegerField(default=0)),
+                ('proximo_intento', models.DateTimeField(default=django.utils.timezone.now)),
+                ('lote', models.UUIDField(blank=True, null=True)),
+                ('respuesta', models.JSONField(blank=True, null=True)),
+                ('ultimo_error', models.TextField(blank=True, default='')),
+                ('creado_en', models.DateTimeField(default=django.utils.timezone.now)),
+                ('enviado_en', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(condition=models.Q(('estado', 'pendiente')), fields=['proximo_intento', 'id'], name='outbox_pendientes_idx')],
+            },
+        ),
+    ]
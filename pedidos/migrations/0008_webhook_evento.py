@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-16 22:56
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0007_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookEvento',
+            fields=[
+                ('id', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('tipo', models.CharField(max_length=40)),
+                ('pedido_id', models.CharField(max_length=64)),
+                ('recibido_en', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
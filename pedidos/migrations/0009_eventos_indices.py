@@ -0,0 +1,26 @@
+# Generated by Django 5.2.8 on 2026-10-16 23:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0008_webhook_evento'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='eventopedido',
+            name='pedido_id',
+            field=models.UUIDField(),
+        ),
+        migrations.AddIndex(
+            model_name='eventopedido',
+            index=models.Index(fields=['pedido_id', 'id'], name='evento_pedido_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='eventopedido',
+            index=models.Index(fields=['creado_en'], name='evento_creado_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-16 23:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0009_eventos_indices'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstadisticaHora',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hora', models.DateTimeField()),
+                ('plato', models.CharField(blank=True, default='', max_length=60)),
+                ('creados', models.PositiveIntegerField(default=0)),
+                ('cancelados', models.PositiveIntegerField(default=0)),
+                ('preparados', models.PositiveIntegerField(default=0)),
+                ('segundos_preparacion', models.FloatField(default=0)),
+            ],
+            options={
+                'ordering': ['hora', 'plato'],
+                'constraints': [models.UniqueConstraint(fields=('hora', 'plato'), name='estadistica_hora_plato_uniq')],
+            },
+        ),
+    ]
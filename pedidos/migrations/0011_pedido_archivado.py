@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-16 23:14
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0010_estadistica_hora'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PedidoArchivado',
+            fields=[
+                ('id', models.UUIDField(editable=False, primary_key=True, serialize=False)),
+                ('mesa', models.IntegerField(blank=True, null=True)),
+                ('cliente', models.CharField(blank=True, max_length=100, null=True)),
+                ('plato', models.CharField(blank=True, default='', max_length=60)),
+                ('estado', models.CharField(choices=[('CREADO', 'Creado'), ('EN_PREPARACION', 'En preparación'), ('LISTO', 'Listo'), ('ENTREGADO', 'Entregado'), ('CERRADO', 'Cerrado'), ('CANCELADO', 'Cancelado')], max_length=20)),
+                ('creado_en', models.DateTimeField()),
+                ('actualizado_en', models.DateTimeField()),
+                ('entregado_en', models.DateTimeField(blank=True, null=True)),
+                ('archivado_en', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['-creado_en'],
+                'indexes': [models.Index(fields=['creado_en', 'id'], name='archivo_creado_id_idx'), models.Index(fields=['mesa', 'creado_en'], name='archivo_mesa_creado_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-16 23:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0011_pedido_archivado'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='eventopedido',
+            name='tipo',
+            field=models.CharField(choices=[('creado', 'Creado'), ('transicion', 'Transición'), ('modificado', 'Modificado'), ('eliminado', 'Eliminado')], max_length=12),
+        ),
+    ]
@@ -1,9 +1,115 @@
 import uuid
-from django.db import models
-from django.core.exceptions import ValidationError
+from django.db import connections, models, transaction
+from django.db.models import BooleanField, ExpressionWrapper, Q, Value
+from django.db.models.functions import Coalesce
+from django.core.exceptions import EmptyResultSet
 from django.utils import timezone
 
 
+class CondicionEnLinea(ExpressionWrapper):
+    """
+    Compila una condición con los valores en línea en lugar de parámetros.
+
+    SQLite solo usa un índice parcial si el WHERE de la consulta contiene
+    literalmente la condición del índice; con parámetros (``?``) no puede
+    probarlo. Usar solo con constantes del código, nunca con datos del usuario.
+    """
+
+    def __init__(self, condicion):
+        super().__init__(condicion, output_field=BooleanField())
+
+    def as_sql(self, compiler, connection):
+        sql, params = compiler.compile(self.expression)
+        if connection.vendor != "sqlite" or not params:
+            return sql, params
+        editor = connection.schema_editor()
+        return sql % tuple(editor.quote_value(p) for p in params), ()
+
+
+class PedidoQuerySet(models.QuerySet):
+    def activos(self):
+        """Pedidos que siguen en curso (ni CERRADO ni CANCELADO)."""
+        return self.filter(CondicionEnLinea(Pedido.Q_ACTIVOS))
+
+    def transicionar(self, pk, destino):
+        """
+        Aplica la transición a ``destino`` como un único UPDATE condicional
+        (compare-and-swap):
+
+            UPDATE ... SET estado = destino WHERE id = pk AND estado IN (origenes)
+
+        Devuelve el pedido ya actualizado, o ``None`` si no existe o su estado
+        no admite la transición. Con ``UPDATE ... RETURNING`` no toma locks ni
+        lee antes de escribir (ver ``transicionar_todos`` para el resto).
+        """
+        filas = self.filter(pk=pk).transicionar_todos(destino)
+        return filas[0] if filas else None
+
+    def transicionar_todos(self, destino):
+        """
+        Igual que ``transicionar`` pero sobre todo el queryset, en un solo
+        UPDATE. Devuelve la lista de pedidos que sí cambiaron de estado.
+
+        Bloqueo: con ``UPDATE ... RETURNING`` (PostgreSQL, SQLite >= 3.35) el
+        propio UPDATE condicional decide qué filas cambian, sin lock previo.
+        Sin RETURNING, en una transacción: ``SELECT ... FOR UPDATE`` de las
+        filas en un estado de origen (quedan bloqueadas hasta el commit, así
+        que una transición concurrente espera y luego ya no las ve), UPDATE
+        por pk y una lectura de las filas actualizadas. En SQLite
+        ``select_for_update`` no hace nada: si otro escritor confirma entre la
+        lectura y el UPDATE, SQLite rechaza el UPDATE ("database is locked")
+        en lugar de pisar el cambio.
+        """
+        qs = self.filter(estado__in=[str(e) for e in Pedido.TRANSICIONES[destino]])
+        ahora = timezone.now()
+
+        connection = connections[qs.db]
+        if _soporta_update_returning(connection):
+            return qs._update_returning(connection, destino, ahora)
+
+        cambios = {"estado": destino, "actualizado_en": ahora}
+        if destino == Pedido.Estado.ENTREGADO:
+            cambios["entregado_en"] = Coalesce("entregado_en", Value(ahora))
+        with transaction.atomic(using=qs.db):
+            pks = list(qs.select_for_update().values_list("pk", flat=True))
+            if not pks:
+                return []
+            self.model.objects.filter(pk__in=pks).update(**cambios)
+            return list(self.model.objects.filter(pk__in=pks))
+
+    def _update_returning(self, connection, destino, ahora):
+        meta = self.model._meta
+        qn = connection.ops.quote_name
+        campo = meta.get_field
+
+        try:
+            where, where_params = self.query.get_compiler(self.db).compile(self.query.where)
+        except EmptyResultSet:
+            return []
+
+        sets = [f"{qn('estado')} = %s", f"{qn('actualizado_en')} = %s"]
+        params = [str(destino), campo("actualizado_en").get_db_prep_save(ahora, connection)]
+        if destino == Pedido.Estado.ENTREGADO:
+            sets.append(f"{qn('entregado_en')} = COALESCE({qn('entregado_en')}, %s)")
+            params.append(campo("entregado_en").get_db_prep_save(ahora, connection))
+        params.extend(where_params)
+
+        columnas = ", ".join(qn(f.column) for f in meta.concrete_fields)
+        sql = (
+            f"UPDATE {qn(meta.db_table)} SET {', '.join(sets)} "
+            f"WHERE {where} "
+            f"RETURNING {columnas}"
+        )
+        return list(self.model.objects.db_manager(self.db).raw(sql, params))
+
+
+def _soporta_update_returning(connection):
+    # SQLite >= 3.35 y PostgreSQL aceptan UPDATE ... RETURNING.
+    if connection.vendor == "postgresql":
+        return True
+    return connection.vendor == "sqlite" and connection.features.can_return_rows_from_bulk_insert
+
+
 class Pedido(models.Model):
     class Estado(models.TextChoices):
         CREADO = "CREADO", "Creado"
@@ -27,12 +133,9 @@ class Pedido(models.Model):
     actualizado_en = models.DateTimeField(auto_now=True)
     entregado_en = models.DateTimeField(null=True, blank=True)
 
-    def save(self, *args, **kwargs):
-        if self.pk:
-            prev = Pedido.objects.filter(pk=self.pk).values_list("estado", flat=True).first()
-        else:
-            prev = None
+    objects = PedidoQuerySet.as_manager()
 
+    def save(self, *args, **kwargs):
         if self.estado == self.Estado.ENTREGADO and self.entregado_en is None:
             self.entregado_en = timezone.now()
 
@@ -40,6 +143,174 @@ class Pedido(models.Model):
 
     class Meta:
         ordering = ["-creado_en"]
+        indexes = [
+            # Listas filtradas por estado y ordenadas por llegada.
+            models.Index(fields=["estado", "creado_en"], name="pedido_estado_creado_idx"),
+            # Índice parcial solo con los pedidos activos (cola de cocina):
+            # su tamaño no crece con el historial de cerrados/cancelados.
+            models.Index(
+                fields=["creado_en"],
+                condition=~Q(estado__in=["CANCELADO", "CERRADO"]),
+                name="pedido_activos_idx",
+            ),
+            models.Index(fields=["mesa", "creado_en"], name="pedido_mesa_creado_idx"),
+            # Orden por defecto y paginación por cursor.
+            models.Index(fields=["creado_en", "id"], name="pedido_creado_id_idx"),
+        ]
+
+    # Debe coincidir con la condición de ``pedido_activos_idx`` para que el
+    # planificador pueda usar el índice parcial.
+    ESTADOS_TERMINALES = [Estado.CANCELADO, Estado.CERRADO]
+    Q_ACTIVOS = ~Q(estado__in=ESTADOS_TERMINALES)
+
+    # Máquina de estados: estado destino -> estados desde los que se puede llegar.
+    TRANSICIONES = {
+        Estado.EN_PREPARACION: (Estado.CREADO,),
+        Estado.LISTO: (Estado.EN_PREPARACION,),
+        Estado.ENTREGADO: (Estado.LISTO,),
+        Estado.CERRADO: (Estado.ENTREGADO,),
+        Estado.CANCELADO: (Estado.CREADO, Estado.EN_PREPARACION),
+    }
 
     def __str__(self):
         return f"Pedido {self.id} (mesa={self.mesa or '-'}, estado={self.estado})"
+
+
+class PedidoArchivado(models.Model):
+    """
+    Pedido CERRADO o CANCELADO que ``archivar_pedidos`` sacó de la tabla de
+    pedidos (ver ``pedidos.archivo``). Mismas columnas que ``Pedido`` más
+    ``archivado_en``; la API solo lo lee con ``?archivo=1``.
+    """
+    id = models.UUIDField(primary_key=True, editable=False)
+    mesa = models.IntegerField(null=True, blank=True)
+    cliente = models.CharField(max_length=100, null=True, blank=True)
+    plato = models.CharField(max_length=60, blank=True, default="")
+    estado = models.CharField(max_length=20, choices=Pedido.Estado.choices)
+    creado_en = models.DateTimeField()
+    actualizado_en = models.DateTimeField()
+    entregado_en = models.DateTimeField(null=True, blank=True)
+    archivado_en = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["-creado_en"]
+        indexes = [
+            models.Index(fields=["creado_en", "id"], name="archivo_creado_id_idx"),
+            models.Index(fields=["mesa", "creado_en"], name="archivo_mesa_creado_idx"),
+        ]
+
+    def __str__(self):
+        return f"Pedido archivado {self.id} (mesa={self.mesa or '-'}, estado={self.estado})"
+
+
+class EventoPedido(models.Model):
+    """
+    Registro append-only de cambios de pedidos (alta, transición, baja).
+    Su ``id`` creciente es el ``Last-Event-ID`` del stream SSE. El tiempo que
+    un pedido pasó en cada estado sale de eventos consecutivos (ver
+    ``pedidos.tiempos``), sin leer la tabla de pedidos.
+    """
+    class Tipo(models.TextChoices):
+        CREADO = "creado", "Creado"
+        TRANSICION = "transicion", "Transición"
+        # Edición de mesa/cliente/plato: no cambia el estado.
+        MODIFICADO = "modificado", "Modificado"
+        ELIMINADO = "eliminado", "Eliminado"
+
+    id = models.BigAutoField(primary_key=True)
+    # Sin FK: el evento debe sobrevivir a la baja del pedido.
+    pedido_id = models.UUIDField()
+    tipo = models.CharField(max_length=12, choices=Tipo.choices)
+    estado = models.CharField(max_length=20, choices=Pedido.Estado.choices)
+    creado_en = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            # Historia de un pedido y "evento anterior del mismo pedido".
+            models.Index(fields=["pedido_id", "id"], name="evento_pedido_id_idx"),
+            # Consultas por rango de tiempo (duraciones por etapa).
+            models.Index(fields=["creado_en"], name="evento_creado_idx"),
+        ]
+
+    def __str__(self):
+        return f"Evento {self.id} {self.tipo} {self.pedido_id} -> {self.estado}"
+
+
+class EstadisticaHora(models.Model):
+    """
+    Rollup por hora (UTC) y plato, sumado en la misma transacción que cada
+    alta/transición (ver ``pedidos.estadisticas``). El tablero lee solo esta
+    tabla; ``recalcular_estadisticas`` la rehace desde cero.
+    """
+    hora = models.DateTimeField()  # inicio de la hora
+    plato = models.CharField(max_length=60, blank=True, default="")
+    creados = models.PositiveIntegerField(default=0)
+    cancelados = models.PositiveIntegerField(default=0)
+    # Pasaron de EN_PREPARACION a LISTO, y cuánto tardaron en total.
+    preparados = models.PositiveIntegerField(default=0)
+    segundos_preparacion = models.FloatField(default=0)
+
+    class Meta:
+        ordering = ["hora", "plato"]
+        constraints = [
+            models.UniqueConstraint(fields=["hora", "plato"], name="estadistica_hora_plato_uniq"),
+        ]
+
+    def __str__(self):
+        return f"Estadística {self.hora:%Y-%m-%d %H}h {self.plato or '-'}"
+
+
+class MensajeOutbox(models.Model):
+    """
+    Llamada pendiente a un módulo externo (M1 stock, M4 cocina), escrita en
+    la misma transacción que el cambio de estado que la origina. La entrega
+    la hace ``python manage.py despachar_outbox`` (ver ``pedidos.outbox``).
+    """
+    class Estado(models.TextChoices):
+        PENDIENTE = "pendiente", "Pendiente"
+        ENVIADO = "enviado", "Enviado"
+        FALLIDO = "fallido", "Fallido"
+        DESCARTADO = "descartado", "Descartado"
+
+    id = models.BigAutoField(primary_key=True)
+    pedido_id = models.UUIDField(db_index=True)
+    destino = models.CharField(max_length=10)  # "m1" | "m4"
+    operacion = models.CharField(max_length=40)  # método del adapter
+    payload = models.JSONField(default=dict)
+
+    estado = models.CharField(max_length=12, choices=Estado.choices, default=Estado.PENDIENTE)
+    intentos = models.PositiveIntegerField(default=0)
+    proximo_intento = models.DateTimeField(default=timezone.now)
+    # Lote del despachador que lo tomó (ver ``outbox._reclamar``).
+    lote = models.UUIDField(null=True, blank=True)
+    respuesta = models.JSONField(null=True, blank=True)
+    ultimo_error = models.TextField(blank=True, default="")
+
+    creado_en = models.DateTimeField(default=timezone.now)
+    enviado_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            # Cola del despachador: solo los pendientes, por vencimiento.
+            models.Index(
+                fields=["proximo_intento", "id"],
+                condition=Q(estado="pendiente"),
+                name="outbox_pendientes_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Outbox {self.id} {self.destino}.{self.operacion} {self.pedido_id} ({self.estado})"
+
+
+class WebhookEvento(models.Model):
+    """Eventos de webhook ya recibidos, por id del emisor (idempotencia)."""
+    id = models.CharField(max_length=100, primary_key=True)
+    tipo = models.CharField(max_length=40)
+    pedido_id = models.CharField(max_length=64)
+    recibido_en = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"Webhook {self.id} {self.tipo} {self.pedido_id}"
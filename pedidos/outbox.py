@@ -0,0 +1,247 @@
+"""
+Outbox transaccional para las llamadas a M1 (stock) y M4 (cocina).
+
+Las transiciones no llaman a los módulos externos: ``encolar`` escribe un
+``MensajeOutbox`` en la misma transacción que el cambio de estado, así la API
+responde apenas se confirma la fila y una caída entre la escritura y la
+llamada no pierde el mensaje. ``despachar_lote`` (comando
+``despachar_outbox``) los entrega en lotes, con reintentos y backoff.
+
+Orden por pedido: solo se toma el mensaje pendiente más antiguo de cada
+pedido, así ``enviar_pedido`` a M4 nunca sale antes de reservar stock en M1.
+"""
+import logging
+import random
+import time
+import uuid
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Exists, Min, OuterRef, Q
+from django.utils import timezone
+
+from .adapters import CocinaClientM4, StockClientM1, items_de
+from .models import CondicionEnLinea, MensajeOutbox, Pedido
+
+log = logging.getLogger(__name__)
+
+Estado = MensajeOutbox.Estado
+
+# Debe coincidir con la condición de ``outbox_pendientes_idx``.
+_PENDIENTES = CondicionEnLinea(Q(estado=Estado.PENDIENTE))
+
+
+# ===================== ENCOLADO =====================
+
+def _mensajes(pedido, destino, reservados):
+    """``[(destino, operacion, payload)]`` que genera la transición."""
+    if destino == Pedido.Estado.EN_PREPARACION:
+        items = items_de(pedido)
+        return [
+            ("m1", "validar_reservar", {"pedido_id": str(pedido.pk), "items": items}),
+            ("m4", "enviar_pedido", {
+                "pedido_id": str(pedido.pk), "mesa": pedido.mesa,
+                "cliente": pedido.cliente, "items": items,
+            }),
+        ]
+    if pedido.pk not in reservados:
+        return []
+    # El id de la reserva se conoce recién al despachar (ver ``_reserva_de``).
+    if destino == Pedido.Estado.CANCELADO:
+        return [("m1", "liberar_reserva", {"reserva_id": None})]
+    if destino == Pedido.Estado.ENTREGADO:
+        return [("m1", "confirmar_descuento", {"reserva_id": None})]
+    return []
+
+
+def encolar(pedidos, destino):
+    """
+    Escribe los mensajes de la transición de ``pedidos`` a ``destino``.
+    Llamar dentro de la transacción del cambio. Al cancelar se descarta el
+    envío a cocina que siga pendiente: M4 no debe recibir un pedido cancelado.
+    """
+    if destino == Pedido.Estado.CANCELADO:
+        MensajeOutbox.objects.filter(_PENDIENTES).filter(
+            pedido_id__in=[p.pk for p in pedidos], destino="m4", operacion="enviar_pedido",
+        ).update(estado=Estado.DESCARTADO, lote=None, ultimo_error="Pedido cancelado antes del envío.")
+    reservados = set()
+    if destino in (Pedido.Estado.CANCELADO, Pedido.Estado.ENTREGADO):
+        reservados = set(
+            MensajeOutbox.objects.filter(
+                pedido_id__in=[p.pk for p in pedidos],
+                operacion="validar_reservar",
+                estado__in=[Estado.PENDIENTE, Estado.ENVIADO],
+            ).values_list("pedido_id", flat=True)
+        )
+    return MensajeOutbox.objects.bulk_create(
+        MensajeOutbox(pedido_id=p.pk, destino=d, operacion=op, payload=payload)
+        for p in pedidos
+        for d, op, payload in _mensajes(p, destino, reservados)
+    )
+
+
+# ===================== DESPACHO =====================
+
+class ErrorPermanente(Exception):
+    """El upstream rechazó el mensaje (4xx): reintentarlo no sirve."""
+
+
+# Contadores del despachador de este proceso.
+stats = {"lotes": 0, "enviados": 0, "reintentos": 0, "fallidos": 0, "descartados": 0, "segundos": 0.0}
+
+_DESCARTAR = object()
+
+
+def _clientes():
+    return {"m1": StockClientM1(), "m4": CocinaClientM4()}
+
+
+def _reclamar(limite, pedidos=None):
+    """
+    Toma hasta ``limite`` mensajes vencidos, solo el pendiente más antiguo de
+    cada pedido (de ``pedidos``, ids o subconsulta, si se indica). Los marca con un ``lote`` propio y corre ``proximo_intento``
+    (lease) en un UPDATE condicional: dos despachadores no toman el mismo
+    mensaje y, si uno muere, sus mensajes vuelven a la cola al vencer el lease.
+    """
+    ahora = timezone.now()
+    anterior = MensajeOutbox.objects.filter(_PENDIENTES).filter(
+        pedido_id=OuterRef("pedido_id"), id__lt=OuterRef("id"),
+    )
+    vencidos = MensajeOutbox.objects.filter(_PENDIENTES).filter(proximo_intento__lte=ahora)
+    if pedidos is not None:
+        vencidos = vencidos.filter(pedido_id__in=pedidos)
+    candidatos = list(
+        vencidos.filter(~Exists(anterior))
+        .order_by("proximo_intento", "id")
+        .values_list("id", flat=True)[:limite]
+    )
+    if not candidatos:
+        return []
+
+    lote = uuid.uuid4()
+    MensajeOutbox.objects.filter(_PENDIENTES).filter(
+        id__in=candidatos, proximo_intento__lte=ahora,
+    ).update(lote=lote, proximo_intento=ahora + timedelta(seconds=settings.OUTBOX_LEASE_SEGUNDOS))
+    return list(MensajeOutbox.objects.filter(lote=lote).order_by("id"))
+
+
+def _reserva_de(pedido_id):
+    """Id de reserva devuelto por M1 para el pedido, o ``None`` si no reservó."""
+    filas = list(
+        MensajeOutbox.objects.filter(
+            pedido_id=pedido_id, operacion="validar_reservar", estado=Estado.ENVIADO,
+        ).values_list("respuesta", flat=True)[:1]
+    )
+    if not filas:
+        return None
+    return (filas[0] or {}).get("reserva_id") or str(pedido_id)
+
+
+def _entregar(mensaje, clientes):
+    payload = dict(mensaje.payload)
+    if "reserva_id" in payload and payload["reserva_id"] is None:
+        payload["reserva_id"] = _reserva_de(mensaje.pedido_id)
+        if payload["reserva_id"] is None:
+            return _DESCARTAR
+    try:
+        return getattr(clientes[mensaje.destino], mensaje.operacion)(**payload)
+    except requests.HTTPError as e:
+        codigo = e.response.status_code if e.response is not None else None
+        if codigo is not None and 400 <= codigo < 500 and codigo not in (408, 429):
+            raise ErrorPermanente(f"HTTP {codigo}: {e.response.text[:500]}") from e
+        raise
+
+
+def _terminar(mensaje, estado, respuesta=None, error=""):
+    mensaje.estado = estado
+    mensaje.lote = None
+    mensaje.respuesta = respuesta
+    if error:
+        mensaje.ultimo_error = error
+    if estado == Estado.ENVIADO:
+        mensaje.intentos += 1
+        mensaje.enviado_en = timezone.now()
+    mensaje.save(update_fields=["estado", "lote", "respuesta", "ultimo_error", "intentos", "enviado_en"])
+    stats[{Estado.ENVIADO: "enviados", Estado.FALLIDO: "fallidos", Estado.DESCARTADO: "descartados"}[estado]] += 1
+    if estado == Estado.FALLIDO:
+        _al_fallar(mensaje)
+
+
+def _reintentar(mensaje, error):
+    mensaje.intentos += 1
+    if mensaje.intentos >= settings.OUTBOX_MAX_INTENTOS:
+        _terminar(mensaje, Estado.FALLIDO, error=error)
+        return
+    # Backoff exponencial con jitter, acotado.
+    espera = min(settings.OUTBOX_BACKOFF_MAX, settings.OUTBOX_BACKOFF * 2 ** (mensaje.intentos - 1))
+    mensaje.proximo_intento = timezone.now() + timedelta(seconds=random.uniform(espera / 2, espera))
+    mensaje.lote = None
+    mensaje.ultimo_error = error
+    mensaje.save(update_fields=["intentos", "proximo_intento", "lote", "ultimo_error"])
+    stats["reintentos"] += 1
+
+
+def _al_fallar(mensaje):
+    """
+    Si no se pudo reservar stock el pedido no se puede preparar: se cancela
+    y se descarta lo que quedaba pendiente para él (el envío a cocina).
+    """
+    if mensaje.operacion != "validar_reservar":
+        return
+    from . import services
+
+    with transaction.atomic():
+        MensajeOutbox.objects.filter(_PENDIENTES).filter(pedido_id=mensaje.pedido_id).update(
+            estado=Estado.DESCARTADO, lote=None,
+        )
+        try:
+            services.cancelar(mensaje.pedido_id)
+        except services.PedidoError:
+            pass
+
+
+def despachar_lote(limite=None, clientes=None, pedidos=None):
+    """
+    Entrega un lote de mensajes vencidos, solo de ``pedidos`` si se indica
+    (p. ej. los de una prueba de carga). Devuelve cuántos procesó.
+    """
+    mensajes = _reclamar(limite or settings.OUTBOX_LOTE, pedidos)
+    if not mensajes:
+        return 0
+
+    clientes = clientes or _clientes()
+    for mensaje in mensajes:
+        inicio = time.monotonic()
+        try:
+            respuesta = _entregar(mensaje, clientes)
+        except ErrorPermanente as e:
+            log.warning("Outbox %s rechazado: %s", mensaje.id, e)
+            mensaje.intentos += 1
+            _terminar(mensaje, Estado.FALLIDO, error=str(e))
+        except Exception as e:
+            log.warning("Outbox %s falló (intento %s): %s", mensaje.id, mensaje.intentos + 1, e)
+            _reintentar(mensaje, f"{type(e).__name__}: {e}"[:1000])
+        else:
+            if respuesta is _DESCARTAR:
+                _terminar(mensaje, Estado.DESCARTADO)
+            else:
+                _terminar(mensaje, Estado.ENVIADO, respuesta=respuesta)
+        stats["segundos"] += time.monotonic() - inicio
+    stats["lotes"] += 1
+    return len(mensajes)
+
+
+# ===================== MÉTRICAS =====================
+
+def estado():
+    """Pendientes, fallidos y antigüedad del pendiente más viejo (lag)."""
+    agg = MensajeOutbox.objects.aggregate(
+        pendientes=Count("id", filter=Q(estado=Estado.PENDIENTE)),
+        fallidos=Count("id", filter=Q(estado=Estado.FALLIDO)),
+        mas_viejo=Min("creado_en", filter=Q(estado=Estado.PENDIENTE)),
+    )
+    mas_viejo = agg.pop("mas_viejo")
+    agg["lag_segundos"] = round((timezone.now() - mas_viejo).total_seconds(), 3) if mas_viejo else 0
+    return agg
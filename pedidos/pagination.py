@@ -0,0 +1,18 @@
+from rest_framework.pagination import CursorPagination
+
+
+class PedidoCursorPagination(CursorPagination):
+    """
+    Paginación por cursor (keyset) sobre ``creado_en``/``id``, de más nuevo a
+    más antiguo. Cada página es un ``WHERE creado_en < ? ... LIMIT n``, así
+    que el costo no crece con el tamaño de la tabla (a diferencia de OFFSET).
+    """
+    ordering = ("-creado_en", "-id")
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 200
+
+
+class CocinaCursorPagination(PedidoCursorPagination):
+    """Cola de cocina: por orden de llegada, el más antiguo primero."""
+    ordering = ("creado_en", "id")
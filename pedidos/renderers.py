@@ -0,0 +1,39 @@
+"""
+Renderer JSON para las listas de pedidos.
+
+Usa orjson cuando está instalado y produce exactamente los mismos bytes que
+el ``JSONRenderer`` de DRF: separadores compactos, UTF-8 sin escapar y
+``\\u2028``/``\\u2029`` escapados. Fechas, decimales y cualquier tipo que
+orjson no serialice igual pasan por el encoder de DRF. Con ``indent`` (API
+navegable, ``Accept: application/json; indent=4``) o sin orjson delega en
+``JSONRenderer``.
+"""
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson es opcional
+    orjson = None
+
+
+class JSONRapidoRenderer(JSONRenderer):
+    if orjson is not None:
+        _opciones = (
+            orjson.OPT_NON_STR_KEYS
+            | orjson.OPT_PASSTHROUGH_DATETIME
+            | orjson.OPT_PASSTHROUGH_DATACLASS
+        )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None or data is None
+            or self.ensure_ascii or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=self._opciones)
+        except (orjson.JSONEncodeError, TypeError):
+            # p. ej. enteros de más de 64 bits: json sí los acepta.
+            return super().render(data, accepted_media_type, renderer_context)
+        return ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
@@ -1,3 +1,4 @@
+from django.utils import timezone
 from rest_framework import serializers
 from .models import Pedido
 
@@ -9,3 +10,88 @@ class PedidoSerializer(serializers.ModelSerializer):
             "estado",
             "creado_en", "actualizado_en", "entregado_en",
         ]
+        # El estado solo cambia por las acciones (confirmar, listo, ...),
+        # que aplican la máquina de estados de Pedido.
+        read_only_fields = ["estado", "entregado_en"]
+
+
+# ===================== LECTURA RÁPIDA =====================
+
+# Campos de ``PedidoSerializer``, en el mismo orden, para ``values_list``.
+CAMPOS = tuple(PedidoSerializer.Meta.fields)
+
+
+def _fecha(valor, tz):
+    # Igual que ``serializers.DateTimeField``: hora local, ISO 8601, "Z" en UTC.
+    if valor is None:
+        return None
+    texto = valor.astimezone(tz).isoformat()
+    return texto[:-6] + "Z" if texto.endswith("+00:00") else texto
+
+
+def filas_pedido(filas):
+    """
+    Misma representación que ``PedidoSerializer(many=True).data`` pero
+    construida directo de las tuplas de ``values_list(*CAMPOS)``, sin
+    instanciar modelos ni pasar por los campos de DRF. Para las listas.
+    """
+    tz = timezone.get_current_timezone()
+    return [
+        {
+            "id": str(id_), "mesa": mesa, "cliente": cliente, "plato": plato,
+            "estado": estado,
+            "creado_en": _fecha(creado_en, tz),
+            "actualizado_en": _fecha(actualizado_en, tz),
+            "entregado_en": _fecha(entregado_en, tz),
+        }
+        for id_, mesa, cliente, plato, estado, creado_en, actualizado_en, entregado_en in filas
+    ]
+
+
+# ===================== CAMPOS PARCIALES / COMPACTO =====================
+
+# Representación compacta (``?formato=compacto``): estado como código de una
+# letra y fechas como epoch en segundos.
+ESTADOS_CORTOS = {
+    Pedido.Estado.CREADO: "C",
+    Pedido.Estado.EN_PREPARACION: "P",
+    Pedido.Estado.LISTO: "L",
+    Pedido.Estado.ENTREGADO: "E",
+    Pedido.Estado.CERRADO: "Z",
+    Pedido.Estado.CANCELADO: "X",
+}
+
+# Lo que necesita la pantalla de cocina (la edad sale de ``creado_en``).
+CAMPOS_COCINA = ("id", "mesa", "plato", "estado", "creado_en")
+
+_FECHAS = ("creado_en", "actualizado_en", "entregado_en")
+
+
+def _epoch(valor):
+    return None if valor is None else int(valor.timestamp())
+
+
+def _conversor(campo, compacto, tz):
+    if campo == "id":
+        return str
+    if campo in _FECHAS:
+        return _epoch if compacto else lambda v: _fecha(v, tz)
+    if campo == "estado" and compacto:
+        return ESTADOS_CORTOS.get
+    return None
+
+
+def representar(filas, campos=CAMPOS, compacto=False):
+    """
+    Filas para la respuesta con solo ``campos`` (``?fields=``). Cada tupla
+    trae primero esos campos, en ese orden; columnas extra al final (p. ej.
+    la clave del cursor) se ignoran. Sin parámetros es ``filas_pedido``.
+    """
+    if tuple(campos) == CAMPOS and not compacto:
+        return filas_pedido(filas)
+    tz = timezone.get_current_timezone()
+    conversores = [(i, c, _conversor(c, compacto, tz)) for i, c in enumerate(campos)]
+    return [
+        {c: f(fila[i]) if f else fila[i] for i, c, f in conversores}
+        for fila in filas
+    ]
@@ -0,0 +1,227 @@
+"""
+Operaciones de negocio sobre pedidos.
+
+Las usan tanto la API REST (``PedidoViewSet``, ``cocina_estado``) como la UI
+(``ui.views``), de modo que una acción de la UI es una sola request y no una
+llamada HTTP de vuelta a la propia API.
+"""
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from . import eventos, outbox
+from .models import EventoPedido, Pedido, PedidoArchivado
+
+
+class PedidoError(Exception):
+    """Error de negocio. ``status`` es el código HTTP con que se informa."""
+    status = 400
+
+
+class PedidoNoExiste(PedidoError):
+    status = 404
+
+
+class TransicionInvalida(PedidoError):
+    status = 409
+
+
+# ===================== CONSULTAS =====================
+
+def listar_pedidos():
+    return Pedido.objects.all()
+
+
+def listar_archivados():
+    """Pedidos terminados que ya pasaron a la tabla de archivo."""
+    return PedidoArchivado.objects.all()
+
+
+def obtener_pedido(pedido_id):
+    try:
+        return Pedido.objects.get(pk=pedido_id)
+    except (Pedido.DoesNotExist, ValidationError, ValueError):
+        raise PedidoNoExiste("Pedido no existe.")
+
+
+# ===================== ALTAS =====================
+
+# Tope de elementos por operación en lote.
+MAXIMO_LOTE = 200
+
+
+def _validar(pedido):
+    try:
+        pedido.full_clean(validate_unique=False)
+    except ValidationError as e:
+        raise PedidoError("; ".join(e.messages))
+
+
+def crear_pedido(mesa=None, cliente=None, plato=""):
+    pedido = Pedido(mesa=mesa, cliente=cliente, plato=plato)
+    _validar(pedido)
+    with transaction.atomic():
+        pedido.save()
+        eventos.registrar(pedido, EventoPedido.Tipo.CREADO)
+    return pedido
+
+
+def crear_pedidos(datos):
+    """
+    Alta de varios pedidos (p. ej. toda una mesa) con un ``bulk_create`` y
+    sus eventos, en una sola transacción: o se crean todos o ninguno.
+    ``datos`` es una lista de dicts con ``mesa``, ``cliente`` y ``plato``.
+    """
+    if not datos:
+        raise PedidoError("Debe indicar al menos un pedido.")
+    if len(datos) > MAXIMO_LOTE:
+        raise PedidoError(f"Máximo {MAXIMO_LOTE} pedidos por lote.")
+
+    pedidos = []
+    for i, d in enumerate(datos):
+        pedido = Pedido(mesa=d.get("mesa"), cliente=d.get("cliente"), plato=d.get("plato", ""))
+        try:
+            _validar(pedido)
+        except PedidoError as e:
+            raise PedidoError(f"Pedido {i}: {e}")
+        pedidos.append(pedido)
+
+    with transaction.atomic():
+        Pedido.objects.bulk_create(pedidos)
+        eventos.registrar_varios(pedidos, EventoPedido.Tipo.CREADO)
+    return pedidos
+
+
+def actualizar_pedido(pedido, datos):
+    """
+    Edición (PUT/PATCH) de mesa, cliente o plato con su evento ``modificado``,
+    en una transacción. El pedido se relee con bloqueo para que el evento
+    lleve el estado vigente aunque haya habido una transición en paralelo.
+    """
+    with transaction.atomic():
+        try:
+            pedido = Pedido.objects.select_for_update().get(pk=pedido.pk)
+        except Pedido.DoesNotExist:
+            raise PedidoNoExiste("Pedido no existe.")
+        for campo, valor in datos.items():
+            setattr(pedido, campo, valor)
+        _validar(pedido)
+        pedido.save(update_fields=[*datos, "actualizado_en"])
+        eventos.registrar(pedido, EventoPedido.Tipo.MODIFICADO)
+    return pedido
+
+
+def eliminar_pedido(pedido):
+    with transaction.atomic():
+        eventos.registrar(pedido, EventoPedido.Tipo.ELIMINADO)
+        pedido.delete()
+
+
+# ===================== TRANSICIONES =====================
+
+def _transicionar(pedido_id, destino):
+    """
+    Aplica la transición con un UPDATE condicional (ver
+    ``PedidoQuerySet.transicionar``). Solo si falla se lee el estado actual,
+    para distinguir "no existe" (404) de "estado inválido" (409).
+
+    Las llamadas a M1/M4 que correspondan quedan en el outbox, en la misma
+    transacción; no se espera a los módulos externos.
+    """
+    try:
+        with transaction.atomic():
+            pedido = Pedido.objects.transicionar(pedido_id, destino)
+            if pedido is not None:
+                eventos.registrar(pedido)
+                outbox.encolar([pedido], destino)
+    except (ValidationError, ValueError):
+        raise PedidoNoExiste("Pedido no existe.")
+    if pedido is not None:
+        return pedido
+
+    actual = Pedido.objects.filter(pk=pedido_id).values_list("estado", flat=True).first()
+    if actual is None:
+        raise PedidoNoExiste("Pedido no existe.")
+    origenes = ", ".join(Pedido.TRANSICIONES[destino])
+    raise TransicionInvalida(
+        f"No se puede pasar de {actual} a {destino}: solo desde {origenes}."
+    )
+
+
+def confirmar(pedido_id):
+    """CREADO -> EN_PREPARACION."""
+    return _transicionar(pedido_id, Pedido.Estado.EN_PREPARACION)
+
+
+def marcar_listo(pedido_id):
+    """EN_PREPARACION -> LISTO (lo indica la cocina)."""
+    return _transicionar(pedido_id, Pedido.Estado.LISTO)
+
+
+def entregar(pedido_id):
+    """LISTO -> ENTREGADO (registra ``entregado_en``)."""
+    return _transicionar(pedido_id, Pedido.Estado.ENTREGADO)
+
+
+def cerrar(pedido_id):
+    """ENTREGADO -> CERRADO (venta finalizada)."""
+    return _transicionar(pedido_id, Pedido.Estado.CERRADO)
+
+
+def cancelar(pedido_id):
+    """CREADO | EN_PREPARACION -> CANCELADO."""
+    return _transicionar(pedido_id, Pedido.Estado.CANCELADO)
+
+
+def transicionar_varios(destino, ids=None, mesa=None):
+    """
+    Transición en lote, por lista de ``ids`` o para los pedidos activos de una
+    ``mesa``, con un único UPDATE condicional (``transicionar_todos``).
+
+    No es todo-o-nada: devuelve un resultado por pedido,
+    ``{"id", "ok", "estado"}`` más ``detail`` en los que no se pudieron pasar
+    (estado inválido o inexistente). Solo se relee el estado de los fallidos.
+    """
+    if destino not in Pedido.TRANSICIONES:
+        raise PedidoError("Estado inválido.")
+    if (ids is None) == (mesa is None):
+        raise PedidoError("Indique ids o mesa (solo uno).")
+
+    fallidos = {}
+    if ids is not None:
+        if len(ids) > MAXIMO_LOTE:
+            raise PedidoError(f"Máximo {MAXIMO_LOTE} pedidos por lote.")
+        pks = []
+        campo = Pedido._meta.pk
+        for i in dict.fromkeys(str(i) for i in ids):
+            try:
+                pks.append(campo.to_python(i))
+            except ValidationError:
+                fallidos[i] = None
+        candidatos = Pedido.objects.filter(pk__in=pks)
+    else:
+        candidatos = Pedido.objects.activos().filter(mesa=mesa)
+
+    with transaction.atomic():
+        pedidos = candidatos.transicionar_todos(destino)
+        eventos.registrar_varios(pedidos)
+        outbox.encolar(pedidos, destino)
+
+    cambiados = {p.pk for p in pedidos}
+    restantes = candidatos.exclude(pk__in=cambiados) if cambiados else candidatos
+    if ids is not None:
+        encontrados = dict(restantes.values_list("pk", "estado"))
+        for pk in pks:
+            if pk not in cambiados:
+                fallidos[str(pk)] = encontrados.get(pk)
+    else:
+        fallidos.update((str(pk), e) for pk, e in restantes.values_list("pk", "estado"))
+
+    origenes = ", ".join(Pedido.TRANSICIONES[destino])
+    resultados = [{"id": str(p.pk), "ok": True, "estado": p.estado} for p in pedidos]
+    for pk, actual in fallidos.items():
+        if actual is None:
+            detail = "Pedido no existe."
+        else:
+            detail = f"No se puede pasar de {actual} a {destino}: solo desde {origenes}."
+        resultados.append({"id": pk, "ok": False, "estado": actual, "detail": detail})
+    return resultados
@@ -0,0 +1,88 @@
+"""
+Tiempos por etapa a partir del log de eventos (``EventoPedido``).
+
+Cada transición cierra la etapa anterior del pedido: lo que duró es la
+diferencia con el evento previo del mismo pedido, que se busca por el
+índice ``(pedido_id, id)``. Los rangos de tiempo usan ``evento_creado_idx``;
+no se lee la tabla de pedidos.
+"""
+import math
+from collections import defaultdict
+
+from django.db.models import OuterRef, Subquery
+from django.utils.timezone import localtime
+
+from .models import EventoPedido
+
+Tipo = EventoPedido.Tipo
+# Eventos que no cambian el estado: no cortan una etapa.
+_SIN_ESTADO = [Tipo.MODIFICADO, Tipo.ELIMINADO]
+
+
+def _anterior():
+    return EventoPedido.objects.filter(
+        pedido_id=OuterRef("pedido_id"), id__lt=OuterRef("id"),
+    ).exclude(tipo__in=_SIN_ESTADO).order_by("-id")
+
+
+def _percentil(orden, p):
+    return orden[max(0, math.ceil(p / 100 * len(orden)) - 1)]
+
+
+def etapas(desde, hasta):
+    """
+    Duración de las etapas que terminaron en ``[desde, hasta)``, agrupadas por
+    ``(estado, siguiente)``, p. ej. ``EN_PREPARACION -> LISTO`` es lo que tardó
+    la cocina. Devuelve ``[{"estado", "siguiente", "cantidad", "promedio_s",
+    "p50_s", "p95_s", "max_s"}]``.
+    """
+    anterior = _anterior()
+    filas = (
+        EventoPedido.objects.filter(tipo=Tipo.TRANSICION, creado_en__gte=desde, creado_en__lt=hasta)
+        .annotate(
+            estado_anterior=Subquery(anterior.values("estado")[:1]),
+            inicio=Subquery(anterior.values("creado_en")[:1]),
+        )
+        .values_list("estado_anterior", "estado", "inicio", "creado_en")
+    )
+    duraciones = defaultdict(list)
+    for estado, siguiente, inicio, fin in filas.iterator(chunk_size=2000):
+        if inicio is not None:
+            duraciones[(estado, siguiente)].append((fin - inicio).total_seconds())
+
+    salida = []
+    for (estado, siguiente), valores in sorted(duraciones.items()):
+        valores.sort()
+        salida.append({
+            "estado": estado,
+            "siguiente": siguiente,
+            "cantidad": len(valores),
+            "promedio_s": round(sum(valores) / len(valores), 1),
+            "p50_s": round(_percentil(valores, 50), 1),
+            "p95_s": round(_percentil(valores, 95), 1),
+            "max_s": round(valores[-1], 1),
+        })
+    return salida
+
+
+def linea_de_tiempo(pedido_id):
+    """
+    Estados por los que pasó un pedido: ``[{"estado", "desde", "hasta",
+    "segundos"}]``; el estado actual queda con ``hasta`` y ``segundos`` en None.
+    """
+    eventos = list(
+        EventoPedido.objects.filter(pedido_id=pedido_id)
+        .exclude(tipo__in=_SIN_ESTADO)
+        .order_by("id")
+        .values_list("estado", "creado_en")
+    )
+    salida = []
+    for i, (estado, inicio) in enumerate(eventos):
+        fin = eventos[i + 1][1] if i + 1 < len(eventos) else None
+        salida.append({
+            "estado": estado,
+            "desde": localtime(inicio),
+            "hasta": localtime(fin) if fin else None,
+            "segundos": round((fin - inicio).total_seconds(), 1) if fin else None,
+        })
+    return salida
@@ -1,13 +1,28 @@
+from django.conf import settings
 from django.urls import path
 from rest_framework.routers import DefaultRouter
-from .views import PedidoViewSet, cocina_estado, cocina_list
+from .views import (
+    PedidoViewSet, cocina_estado, cocina_list, estadisticas_view, exportar_pedidos, integraciones,
+    pedidos_stream, webhook_cocina,
+)
 
 router = DefaultRouter()
 router.register(r'pedidos', PedidoViewSet, basename='pedido')
 
 urlpatterns = [
+    # Antes del router: "stream"/"export" no deben tomarse como {id} de un pedido.
+    path("pedidos/stream/", pedidos_stream, name="pedido-stream"),
+    path("pedidos/export/", exportar_pedidos, name="pedido-export"),
     path("cocina/estado/", cocina_estado, name="cocina-estado"),
     path("cocina/lista/", cocina_list, name="cocina-lista"),
+    path("integraciones/", integraciones, name="integraciones"),
+    path("estadisticas/", estadisticas_view, name="estadisticas"),
+    path("webhooks/cocina/eventos/", webhook_cocina, name="webhook-cocina"),
 ]
 
 urlpatterns += router.urls
+
+if settings.ASYNC_VIEWS:
+    from .asincrono import envolver
+
+    envolver(urlpatterns, {"pedido-list", "pedido-detail", "cocina-lista"})
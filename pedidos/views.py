@@ -1,10 +1,104 @@
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework.generics import get_object_or_404
 from rest_framework.viewsets import ModelViewSet
-from rest_framework.decorators import action, api_view
+from rest_framework.decorators import action, api_view, renderer_classes
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.exceptions import NotFound, ValidationError
 
+from . import (
+    condicional, estadisticas, eventos, exportar, metricas, outbox, services, tiempos, webhooks,
+)
+from .http import estado_integraciones
+from .filters import PedidoFilterBackend, filtrar_pedidos, parse_fecha
 from .models import Pedido
-from .serializers import PedidoSerializer
+from .pagination import PedidoCursorPagination
+from .renderers import JSONRapidoRenderer
+from .serializers import CAMPOS, CAMPOS_COCINA, PedidoSerializer, representar
+
+# Las vistas de pedidos solo devuelven textos, enteros y fechas ya
+# formateadas: orjson produce los mismos bytes que ``JSONRenderer``.
+RENDERERS = [JSONRapidoRenderer, BrowsableAPIRenderer]
+
+
+def _since(request):
+    valor = request.query_params.get("since")
+    if valor is None:
+        return None
+    try:
+        return int(valor)
+    except ValueError:
+        raise ValidationError({"since": "Debe ser un entero (watermark)."})
+
+
+def _campos(request, por_defecto=CAMPOS):
+    """
+    ``?fields=id,estado``: campos a devolver (sparse fieldset), en el orden
+    de ``PedidoSerializer``. Solo esas columnas se leen de la base.
+    """
+    valor = request.query_params.get("fields")
+    if not valor:
+        return por_defecto
+    solicitados = {c.strip() for c in valor.split(",") if c.strip()}
+    invalidos = solicitados - set(CAMPOS)
+    if invalidos:
+        raise ValidationError({"fields": f"Campos inválidos: {', '.join(sorted(invalidos))}."})
+    return tuple(c for c in CAMPOS if c in solicitados) or por_defecto
+
+
+def _compacto(request):
+    """``?formato=compacto``: estado en código corto y fechas en epoch."""
+    formato = request.query_params.get("formato")
+    if formato and formato != "compacto":
+        raise ValidationError({"formato": "Formato inválido, usa 'compacto'."})
+    return bool(formato)
+
+
+def _respuesta_delta(qs, desde, campos=CAMPOS, compacto=False):
+    """
+    Respuesta de sincronización incremental: solo lo que cambió desde la
+    marca ``desde``. El cliente guarda ``watermark`` para el próximo pedido.
+    """
+    watermark, pedidos, eliminados, hay_mas = eventos.delta(qs, desde)
+    filas = [tuple(getattr(p, c) for c in campos) for p in pedidos]
+    return Response({
+        "watermark": watermark,
+        "results": representar(filas, campos, compacto),
+        "eliminados": eliminados,
+        "hay_mas": hay_mas,
+    })
+
+
+def _archivo(request):
+    """``?archivo=1``: leer del archivo (pedidos terminados antiguos)."""
+    valor = request.query_params.get("archivo", "").lower()
+    if valor not in ("", "0", "1", "false", "true"):
+        raise ValidationError({"archivo": "Usa 1 o 0."})
+    return valor in ("1", "true")
+
+
+def _rango(request):
+    """``?desde=`` / ``?hasta=``; por defecto, las últimas 24 horas."""
+    hasta = request.query_params.get("hasta")
+    hasta = parse_fecha(hasta, "hasta") if hasta else timezone.now()
+    desde = request.query_params.get("desde")
+    desde = parse_fecha(desde, "desde") if desde else hasta - timedelta(days=1)
+    return desde, hasta
+
+
+def _con_watermark(response, watermark):
+    # Marca inicial para empezar a pedir deltas con ?since=.
+    response["X-Watermark"] = str(watermark)
+    return response
 
 
 class PedidoViewSet(ModelViewSet):
@@ -25,80 +119,193 @@ class PedidoViewSet(ModelViewSet):
     - PATCH  /api/pedidos/{id}/listo/
     - PATCH  /api/pedidos/{id}/entregar/
     - PATCH  /api/pedidos/{id}/cerrar/
+    - POST   /api/pedidos/bulk/              -> alta de varios pedidos
+    - POST   /api/pedidos/bulk/transicion/   -> transición en lote
+    - GET    /api/pedidos/tiempos/           -> duración por etapa (rango)
+    - GET    /api/pedidos/{id}/tiempos/      -> estados de un pedido con sus horas
+
+    La lista se pagina por cursor (``?cursor=``, ``?page_size=``) y acepta
+    los filtros ``estado``, ``mesa``, ``cliente``, ``desde`` y ``hasta``.
+    ``list`` (ETag) y ``retrieve`` (ETag/Last-Modified) responden ``304`` si
+    no hubo cambios. ``list`` arma las filas desde ``values_list`` (ver
+    ``serializers.filas_pedido``) en lugar de instanciar cada pedido.
+    ``list`` y ``retrieve`` aceptan ``?fields=id,estado,...`` (solo esos
+    campos, y solo esas columnas en el SELECT) y ``?formato=compacto`` (ver
+    ``serializers.representar``). ``list?since=<watermark>`` devuelve solo
+    los cambios (ver ``_respuesta_delta``); el header ``X-Watermark`` da la
+    marca inicial.
+    ``list?archivo=1`` y ``retrieve?archivo=1`` leen los pedidos ya archivados
+    (``PedidoArchivado``, ver ``pedidos.archivo``); sin ese parámetro solo
+    se consulta la tabla de pedidos.
+
+    La lógica vive en ``pedidos.services``; la UI llama a las mismas funciones.
     """
 
-    queryset = Pedido.objects.all()
     serializer_class = PedidoSerializer
+    renderer_classes = RENDERERS
+    pagination_class = PedidoCursorPagination
+    filter_backends = [PedidoFilterBackend]
+
+    def get_queryset(self):
+        if self.action in ("list", "retrieve") and _archivo(self.request):
+            return services.listar_archivados()
+        return services.listar_pedidos()
+
+    def list(self, request, *args, **kwargs):
+        qs = self.filter_queryset(self.get_queryset())
+        campos, compacto = _campos(request), _compacto(request)
+        desde = _since(request)
+        if desde is not None:
+            return _respuesta_delta(qs, desde, campos, compacto)
+
+        etag, ultimo = condicional.validadores_lista(request, qs)
+        no_modificado = condicional.no_modificado(request, etag, ultimo)
+        if no_modificado:
+            return no_modificado
+        watermark = eventos.marca()
+        # El cursor necesita ``creado_en`` aunque no se haya pedido.
+        columnas = campos if "creado_en" in campos else (*campos, "creado_en")
+        filas = qs.values_list(*columnas, named=True)
+        pagina = self.paginate_queryset(filas)
+        if pagina is None:
+            response = Response(representar(filas, campos, compacto))
+        else:
+            response = self.get_paginated_response(representar(pagina, campos, compacto))
+        return _con_watermark(condicional.marcar(response, etag, ultimo), watermark)
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        etag, ultimo = condicional.validadores_detalle(request, self.get_queryset(), pk)
+        no_modificado = condicional.no_modificado(request, etag, ultimo)
+        if no_modificado:
+            return no_modificado
+        campos, compacto = _campos(request), _compacto(request)
+        if campos == CAMPOS and not compacto:
+            response = super().retrieve(request, *args, **kwargs)
+        else:
+            # Solo las columnas pedidas, como ``list``.
+            fila = get_object_or_404(self.get_queryset().values_list(*campos), **{self.lookup_field: pk})
+            response = Response(representar([fila], campos, compacto)[0])
+        return condicional.marcar(response, etag, ultimo)
+
+    def perform_create(self, serializer):
+        serializer.instance = services.crear_pedido(**serializer.validated_data)
+
+    def perform_update(self, serializer):
+        try:
+            serializer.instance = services.actualizar_pedido(serializer.instance, serializer.validated_data)
+        except services.PedidoNoExiste as e:
+            raise NotFound(str(e))
+
+    def perform_destroy(self, instance):
+        services.eliminar_pedido(instance)
+
+    @action(detail=False, methods=["post"], url_path="bulk")
+    def bulk(self, request):
+        """
+        Crea varios pedidos en una transacción (todos o ninguno).
+        body: [ {"mesa": 3, "cliente": "...", "plato": "P01"}, ... ]
+        """
+        if not isinstance(request.data, list):
+            raise ValidationError({"detail": "Se espera una lista de pedidos."})
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        try:
+            pedidos = services.crear_pedidos(serializer.validated_data)
+        except services.PedidoError as e:
+            return Response({"detail": str(e)}, status=e.status)
+        return Response(self.get_serializer(pedidos, many=True).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=["post"], url_path="bulk/transicion")
+    def bulk_transicion(self, request):
+        """
+        Transición en lote con un solo UPDATE.
+        body: { "estado": "CERRADO", "ids": ["<uuid>", ...] }  o  { "estado": "CERRADO", "mesa": 3 }
+        Responde 200 con un resultado por pedido (``ok``, ``estado``, ``detail``).
+        """
+        ids = request.data.get("ids")
+        mesa = request.data.get("mesa")
+        if ids is not None and not isinstance(ids, list):
+            raise ValidationError({"ids": "Debe ser una lista."})
+        if mesa is not None:
+            try:
+                mesa = int(mesa)
+            except (TypeError, ValueError):
+                raise ValidationError({"mesa": "Debe ser un entero."})
+
+        estado = request.data.get("estado")
+        try:
+            resultados = services.transicionar_varios(estado, ids=ids, mesa=mesa)
+        except services.PedidoError as e:
+            return Response({"detail": str(e)}, status=e.status)
+        return Response({"estado": estado, "resultados": resultados})
+
+    @action(detail=False, methods=["get"], url_path="tiempos")
+    def tiempos(self, request):
+        """
+        Cuánto duró cada etapa (p. ej. EN_PREPARACION -> LISTO) en las
+        transiciones entre ``?desde=`` y ``?hasta=`` (por defecto, las
+        últimas 24 horas). Se calcula solo con el log de eventos.
+        """
+        desde, hasta = _rango(request)
+        return Response({"desde": desde, "hasta": hasta, "etapas": tiempos.etapas(desde, hasta)})
+
+    @action(detail=True, methods=["get"], url_path="tiempos")
+    def linea_de_tiempo(self, request, pk=None):
+        """Estados por los que pasó el pedido, con hora de entrada y duración."""
+        linea = tiempos.linea_de_tiempo(self.get_object().pk)
+        return Response({"id": pk, "estados": linea})
+
+    def _transicion(self, operacion, pk):
+        try:
+            pedido = operacion(pk)
+        except services.PedidoError as e:
+            return Response({"detail": str(e)}, status=e.status)
+        serializer = self.get_serializer(pedido)
+        return Response(serializer.data, status=status.HTTP_200_OK)
 
     @action(detail=True, methods=["post"])
     def confirmar(self, request, pk=None):
         """
-        Confirma el pedido: valida stock (Módulo 1) y lo pasa a EN_PREPARACION.
+        Confirma el pedido y lo pasa a EN_PREPARACION.
         """
-        pedido = self.get_object()
-        try:
-            pedido.confirmar()  # método del modelo
-            serializer = self.get_serializer(pedido)
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        except Exception as e:
-            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return self._transicion(services.confirmar, pk)
 
     @action(detail=True, methods=["post"])
     def cancelar(self, request, pk=None):
         """
-        Cancela el pedido y libera el stock reservado.
+        Cancela el pedido.
         """
-        pedido = self.get_object()
-        try:
-            pedido.cancelar()  # método del modelo
-            serializer = self.get_serializer(pedido)
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        except Exception as e:
-            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return self._transicion(services.cancelar, pk)
 
     @action(detail=True, methods=["patch"])
     def listo(self, request, pk=None):
         """
         Marca el pedido como LISTO desde la cocina.
-
-        Este endpoint lo llama el webhook:
-          POST /api/webhooks/cocina/pedido-listo/
-        que internamente hace PATCH a:
-          /api/pedidos/{id}/listo/
         """
-        pedido = self.get_object()
-        try:
-            pedido.marcar_listo()  # método del modelo
-            serializer = self.get_serializer(pedido)
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        except Exception as e:
-            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return self._transicion(services.marcar_listo, pk)
 
     @action(detail=True, methods=["patch"])
     def entregar(self, request, pk=None):
         """
         Marca el pedido como ENTREGADO al cliente.
         """
-        pedido = self.get_object()
-        try:
-            pedido.entregar()  # método del modelo
-            serializer = self.get_serializer(pedido)
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        except Exception as e:
-            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return self._transicion(services.entregar, pk)
 
     @action(detail=True, methods=["patch"])
     def cerrar(self, request, pk=None):
         """
         Cierra el pedido (venta finalizada).
         """
-        pedido = self.get_object()
-        try:
-            pedido.cerrar()  # método del modelo
-            serializer = self.get_serializer(pedido)
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        except Exception as e:
-            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return self._transicion(services.cerrar, pk)
+
+
+# Operaciones que la pantalla de cocina puede pedir, por estado destino.
+_OPERACIONES_COCINA = {
+    Pedido.Estado.EN_PREPARACION: services.confirmar,
+    Pedido.Estado.LISTO: services.marcar_listo,
+    Pedido.Estado.CANCELADO: services.cancelar,
+}
 
 
 @api_view(["POST"])
@@ -115,38 +322,144 @@ def cocina_estado(request):
             status=status.HTTP_400_BAD_REQUEST,
         )
 
-    try:
-        p = Pedido.objects.get(pk=pid)
-        if estado == "EN_PREPARACION":
-            if p.estado != Pedido.Estado.CREADO:
-                return Response(
-                    {"detail": "Solo desde CREADO."},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-            p.estado = Pedido.Estado.EN_PREPARACION
-            p.full_clean()
-            p.save(update_fields=["estado", "actualizado_en"])
-        elif estado == "LISTO":
-            p.marcar_listo()
-        elif estado == "CANCELADO":
-            p.cancelar()
-        else:
-            return Response({"detail": "Estado inválido."}, status=status.HTTP_400_BAD_REQUEST)
+    operacion = _OPERACIONES_COCINA.get(estado)
+    if operacion is None:
+        return Response({"detail": "Estado inválido."}, status=status.HTTP_400_BAD_REQUEST)
 
-        return Response(PedidoSerializer(p).data)
-    except Pedido.DoesNotExist:
-        return Response({"detail": "Pedido no existe."}, status=status.HTTP_404_NOT_FOUND)
-    except Exception as e:
-        return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        p = operacion(pid)
+    except services.PedidoError as e:
+        return Response({"detail": str(e)}, status=e.status)
+    return Response(PedidoSerializer(p).data)
 
 
 @api_view(["GET"])
+@renderer_classes(RENDERERS)
 def cocina_list(request):
     """
     Devuelve pedidos activos para visualizar en la cocina.
-    (excluye CANCELADO y CERRADO)
+    (excluye CANCELADO y CERRADO). Soporta GET condicional (304) y
+    ``?since=<watermark>``: solo los cambios, con los que salieron de la cola
+    (CERRADO/CANCELADO) en ``eliminados``.
+
+    ``?formato=compacto`` devuelve solo ``CAMPOS_COCINA`` con estado en código
+    corto y ``creado_en`` en epoch, para pantallas que consultan todo el día;
+    ``?fields=`` elige otros campos.
+    """
+    activos = Pedido.objects.activos().order_by("creado_en")
+    compacto = _compacto(request)
+    campos = _campos(request, CAMPOS_COCINA if compacto else CAMPOS)
+    desde = _since(request)
+    if desde is not None:
+        return _respuesta_delta(activos, desde, campos, compacto)
+
+    etag, ultimo = condicional.validadores_lista(request, activos)
+    no_modificado = condicional.no_modificado(request, etag, ultimo)
+    if no_modificado:
+        return no_modificado
+    watermark = eventos.marca()
+    response = Response(representar(activos.values_list(*campos), campos, compacto))
+    return _con_watermark(condicional.marcar(response, etag, ultimo), watermark)
+
+
+@require_GET
+def pedidos_stream(request):
+    """
+    Stream SSE de cambios de pedidos (eventos ``creado``, ``transicion``,
+    ``modificado`` y ``eliminado``; ``data`` es el pedido serializado más ``tipo``).
+
+    Reanuda desde el header ``Last-Event-ID`` (lo manda el navegador al
+    reconectar) o desde ``?ultimo=<id>``; sin ninguno parte desde ahora.
+    Bajo ASGI el cuerpo es un generador async: la conexión no ocupa un hilo.
+    """
+    desde = request.headers.get("Last-Event-ID") or request.GET.get("ultimo")
+    try:
+        desde = int(desde) if desde else eventos.marca()
+    except ValueError:
+        desde = eventos.marca()
+
+    cuerpo = eventos.astream(desde) if isinstance(request, ASGIRequest) else eventos.stream(desde)
+    response = StreamingHttpResponse(cuerpo, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+@csrf_exempt
+@require_POST
+def webhook_cocina(request):
+    """
+    Webhook de M4: lote de eventos firmados en una sola request.
+    body: [ {"id": "<id evento>", "tipo": "pedido.listo|pedido.cancelado", "pedido_id": "<uuid>"}, ... ]
+    header: X-Signature: <hmac-sha256 hex del body>
+    """
+    try:
+        webhooks.verificar_firma(request.body, request.headers.get("X-Signature"))
+        try:
+            lote = json.loads(request.body)
+        except ValueError:
+            raise webhooks.WebhookError("JSON inválido.")
+        if isinstance(lote, dict):
+            lote = lote.get("eventos")
+        resultados = webhooks.procesar(lote)
+    except webhooks.WebhookError as e:
+        return JsonResponse({"detail": str(e)}, status=e.status)
+    return JsonResponse({
+        "recibidos": len(resultados),
+        "duplicados": sum(1 for r in resultados if r.get("duplicado")),
+        "resultados": resultados,
+    })
+
+
+@api_view(["GET"])
+def integraciones(request):
     """
-    activos = Pedido.objects.exclude(
-        estado__in=[Pedido.Estado.CANCELADO, Pedido.Estado.CERRADO]
-    ).order_by("creado_en")
-    return Response(PedidoSerializer(activos, many=True).data)
+    Estado de los clientes HTTP de este worker: circuit breakers, contadores
+    de llamadas/reintentos/fallos y conexiones del pool, más el atraso del
+    outbox (pendientes, fallidos y segundos del pendiente más viejo).
+    """
+    datos = estado_integraciones()
+    datos["outbox"] = outbox.estado()
+    return Response(datos)
+
+
+@api_view(["GET"])
+def exportar_pedidos(request):
+    """
+    Historial de pedidos en CSV (por defecto) o JSONL (``?formato=jsonl``),
+    enviado por streaming en orden de llegada. Acepta los filtros de la
+    lista (``desde``, ``hasta``, ``estado``, ``mesa``, ``cliente``) y
+    ``?archivo=1`` para exportar los pedidos archivados.
+    """
+    formato = request.query_params.get("formato", "csv")
+    if formato not in exportar.FORMATOS:
+        raise ValidationError({"formato": "Formato inválido, usa csv o jsonl."})
+    qs = services.listar_archivados() if _archivo(request) else services.listar_pedidos()
+    qs = filtrar_pedidos(qs, request.query_params)
+
+    generar = exportar.csv_stream if formato == "csv" else exportar.jsonl_stream
+    cuerpo = generar(qs, settings.EXPORTAR_CHUNK)
+    if isinstance(request._request, ASGIRequest):
+        cuerpo = exportar.aen_hilo(cuerpo)
+    response = StreamingHttpResponse(cuerpo, content_type=exportar.FORMATOS[formato])
+    response["Content-Disposition"] = f'attachment; filename="{exportar.nombre_archivo(formato)}"'
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
+@api_view(["GET"])
+def estadisticas_view(request):
+    """
+    Pedidos y cancelaciones por hora, tasa de cancelación y tiempo medio de
+    preparación por plato entre ``?desde=`` y ``?hasta=`` (por defecto, las
+    últimas 24 horas); ``?plato=`` filtra uno. Se lee de ``EstadisticaHora``.
+    """
+    desde, hasta = _rango(request)
+    datos = estadisticas.consultar(desde, hasta, request.query_params.get("plato"))
+    return Response({"desde": desde, "hasta": hasta, **datos})
+
+
+@require_GET
+def metrics(request):
+    """Métricas de todos los procesos en formato de texto de Prometheus."""
+    return HttpResponse(metricas.exponer(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,120 @@
+"""
+Webhook de la cocina (M4): recibe lotes de eventos firmados.
+
+- Firma: ``X-Signature`` = HMAC-SHA256 hex del body con ``M3_WEBHOOK_SECRET``
+  (``adapters.build_signature``), comparada en tiempo constante.
+- Idempotencia: el ``id`` de cada evento queda en ``WebhookEvento``; una
+  reentrega del mismo evento se informa como ``duplicado`` y no se reaplica.
+- Las transiciones se aplican en el proceso y en una sola transacción, con
+  un UPDATE por estado destino (``services.transicionar_varios``).
+"""
+import hmac
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+
+from . import services
+from .adapters import build_signature
+from .models import Pedido, WebhookEvento
+
+# Tipo de evento de M4 -> estado destino del pedido.
+TIPOS = {
+    "pedido.listo": Pedido.Estado.LISTO,
+    "pedido.cancelado": Pedido.Estado.CANCELADO,
+}
+
+
+class WebhookError(Exception):
+    status = 400
+
+
+class FirmaInvalida(WebhookError):
+    status = 401
+
+
+def verificar_firma(body, firma):
+    if not firma:
+        raise FirmaInvalida("Falta X-Signature.")
+    firma = firma.removeprefix("sha256=")
+    esperada = build_signature(settings.M3_WEBHOOK_SECRET, body)
+    if not hmac.compare_digest(esperada, firma):
+        raise FirmaInvalida("Firma inválida.")
+
+
+def _validar(eventos):
+    if not isinstance(eventos, list) or not eventos:
+        raise WebhookError("Se espera una lista de eventos.")
+    if len(eventos) > services.MAXIMO_LOTE:
+        raise WebhookError(f"Máximo {services.MAXIMO_LOTE} eventos por entrega.")
+    for e in eventos:
+        if not isinstance(e, dict) or not e.get("id") or not e.get("pedido_id"):
+            raise WebhookError("Cada evento requiere id y pedido_id.")
+        if len(str(e["id"])) > 100:
+            raise WebhookError("id de evento demasiado largo.")
+        if e.get("tipo") not in TIPOS:
+            raise WebhookError(f"Tipo de evento desconocido: {e.get('tipo')!r}.")
+
+
+def _pedido_id(valor):
+    # Forma canónica (la de ``str(pk)``), que es como ``transicionar_varios``
+    # devuelve los resultados; un id inválido queda tal cual.
+    try:
+        return str(Pedido._meta.pk.to_python(valor))
+    except ValidationError:
+        return str(valor)
+
+
+def _aplicar(eventos):
+    eventos = [{**e, "pedido_id": _pedido_id(e["pedido_id"])} for e in eventos]
+    ids = [str(e["id"]) for e in eventos]
+    vistos = set(WebhookEvento.objects.filter(id__in=ids).values_list("id", flat=True))
+
+    nuevos = {}
+    for e in eventos:
+        if str(e["id"]) not in vistos:
+            nuevos.setdefault(str(e["id"]), e)
+    WebhookEvento.objects.bulk_create(
+        WebhookEvento(id=i, tipo=e["tipo"], pedido_id=e["pedido_id"][:64])
+        for i, e in nuevos.items()
+    )
+
+    # Un UPDATE por estado destino; resultado indexado por pedido.
+    por_destino = {}
+    for e in nuevos.values():
+        por_destino.setdefault(TIPOS[e["tipo"]], []).append(e["pedido_id"])
+    resultado_pedido = {}
+    for destino, pedido_ids in por_destino.items():
+        for r in services.transicionar_varios(destino, ids=pedido_ids):
+            resultado_pedido[(destino, r["id"])] = r
+
+    resultados = []
+    for e in eventos:
+        i = str(e["id"])
+        if i in vistos or i not in nuevos or nuevos[i] is not e:
+            resultados.append({"id": i, "ok": True, "duplicado": True})
+            continue
+        r = resultado_pedido.get((TIPOS[e["tipo"]], e["pedido_id"]), {})
+        fila = {"id": i, "ok": r.get("ok", False)}
+        if not fila["ok"]:
+            fila["detail"] = r.get("detail", "Pedido no existe.")
+        resultados.append(fila)
+    return resultados
+
+
+def procesar(eventos):
+    """
+    Aplica un lote de eventos ``{"id", "tipo", "pedido_id"}`` y devuelve un
+    resultado por evento. Un evento sobre un pedido en otro estado se da por
+    recibido (``ok: false`` con el motivo): reenviarlo no lo arreglaría.
+    """
+    _validar(eventos)
+    for intento in range(2):
+        try:
+            with transaction.atomic():
+                return _aplicar(eventos)
+        except IntegrityError:
+            # Entrega concurrente con los mismos ids: la segunda vuelta los ve
+            # como duplicados.
+            if intento:
+                raise
@@ -0,0 +1,19 @@
+"""
+Runner de ``manage.py test``: las métricas que vuelca el proceso de tests
+van a un directorio temporal y no a ``data/metricas/``.
+"""
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class Runner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._metricas = tempfile.TemporaryDirectory(prefix="metricas-")
+        settings.METRICAS_DIR = self._metricas.name
+
+    def teardown_test_environment(self, **kwargs):
+        super().teardown_test_environment(**kwargs)
+        self._metricas.cleanup()
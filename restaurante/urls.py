@@ -1,15 +1,18 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 
-from django.contrib import admin
-from django.urls import path, include
+from pedidos.views import metrics
 
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("metrics", metrics, name="metrics"),
     path("", include(("ui.urls","ui"), namespace="ui")),
-    path("mock/", include("mock.urls")),
     path("api/", include("pedidos.urls")),
-
-    path("api/webhooks/", include(("mock.urls","mock"), namespace="mock")),
 ]
 
+# Los mocks de M1/M4 (incluido el aviso de "pedido listo", que no va firmado)
+# solo existen en modo demo; el webhook real es /api/webhooks/cocina/eventos/.
+if settings.USE_MOCKS:
+    urlpatterns.append(path("mock/", include("mock.urls")))
+
@@ -0,0 +1,201 @@
+"""
+Catálogos externos (platos y mesas) con caché compartida entre workers.
+
+Cada catálogo se guarda en la caché ``settings.CATALOGOS_CACHE`` junto con la
+hora en que se descargó. Mientras la copia tenga menos de ``ttl`` segundos se
+sirve tal cual; si está vencida se sirve igual (stale) y se lanza un refresco
+en segundo plano. Si la API externa falla se mantiene la última copia buena
+y no se reintenta hasta que vence el lock de refresco (``LOCK_TIMEOUT``).
+Solo cuando no existe ninguna copia se descarga de forma bloqueante.
+
+Cada descarga queda en ``upstream_request_duration_seconds`` (upstream
+``catalogo_platos`` / ``catalogo_mesas``, ver ``pedidos.metricas``).
+
+Los métodos con prefijo ``a`` (``aentrada``, ``adatos``...) hacen lo mismo
+sin bloquear el event loop (httpx y caché async), para vistas ASGI.
+"""
+import asyncio
+import logging
+import threading
+import time
+
+import httpx
+import requests
+from django.conf import settings
+from django.core.cache import caches
+
+from pedidos import metricas
+
+logger = logging.getLogger(__name__)
+
+PLATOS_URL = "https://web-production-2d3fb.up.railway.app/api/platos/"
+MESAS_URL = "https://sistema-gestion-restaurant.up.railway.app/api/mesas/"
+
+
+def _cache():
+    return caches[settings.CATALOGOS_CACHE]
+
+
+class Catalogo:
+    """
+    Un catálogo remoto cacheado. El TTL se lee de ``settings.<ttl_setting>``.
+
+    - ``parse(data)`` transforma el JSON de la API en la lista que usa la UI.
+    - ``indexar(datos)`` (opcional) construye un índice que se guarda junto
+      a los datos, para no recalcularlo en cada render.
+    """
+
+    # Tiempo máximo que un worker puede retener el lock de refresco. Tras un
+    # refresco fallido el lock se deja vencer solo: es la espera antes del
+    # próximo intento, así una API caída no recibe una descarga por request.
+    LOCK_TIMEOUT = 30
+
+    def __init__(self, nombre, url, parse, ttl_setting, indexar=None, timeout=10):
+        self.nombre = nombre
+        self.url = url
+        self.parse = parse
+        self.ttl_setting = ttl_setting
+        self.indexar = indexar
+        self.timeout = timeout
+
+    @property
+    def ttl(self):
+        return getattr(settings, self.ttl_setting)
+
+    @property
+    def _key(self):
+        return f"catalogo:{self.nombre}"
+
+    @property
+    def _lock_key(self):
+        return f"catalogo:{self.nombre}:refrescando"
+
+    def _descargar(self):
+        with metricas.medir_upstream(f"catalogo_{self.nombre}", "get") as m:
+            r = requests.get(self.url, timeout=self.timeout)
+            m.resultado = r.status_code
+        r.raise_for_status()
+        return self.parse(r.json())
+
+    def refrescar(self):
+        """Descarga el catálogo y lo guarda en caché (sin expiración)."""
+        datos = self._descargar()
+        entrada = {
+            "datos": datos,
+            "indice": self.indexar(datos) if self.indexar else None,
+            "obtenido_en": time.time(),
+        }
+        _cache().set(self._key, entrada, timeout=None)
+        return entrada
+
+    def _refrescar_en_segundo_plano(self):
+        # Solo quien agrega el lock refresca. En FileBasedCache ``add`` no es
+        # atómico entre procesos (lee y después escribe): dos workers pueden
+        # refrescar a la vez, lo que solo repite una descarga.
+        if not _cache().add(self._lock_key, 1, timeout=self.LOCK_TIMEOUT):
+            return
+        threading.Thread(target=self._tarea_refresco, daemon=True).start()
+
+    def _tarea_refresco(self):
+        try:
+            self.refrescar()
+        except Exception as e:
+            logger.warning("No se pudo refrescar catálogo %s: %s", self.nombre, e)
+        else:
+            _cache().delete(self._lock_key)
+
+    def entrada(self):
+        """
+        Devuelve ``{"datos", "indice", "obtenido_en"}``.
+        Lanza la excepción de la API solo si no hay ninguna copia en caché.
+        """
+        entrada = _cache().get(self._key)
+        if entrada is None:
+            return self.refrescar()
+        if time.time() - entrada["obtenido_en"] > self.ttl:
+            self._refrescar_en_segundo_plano()
+        return entrada
+
+    def datos(self):
+        return self.entrada()["datos"]
+
+    def indice(self):
+        return self.entrada()["indice"]
+
+    # ----- versión async -----
+
+    # Referencias a las tareas de refresco en curso (si no, el GC puede
+    # cancelarlas antes de terminar).
+    _tareas = set()
+
+    async def _adescargar(self):
+        with metricas.medir_upstream(f"catalogo_{self.nombre}", "get") as m:
+            async with httpx.AsyncClient(timeout=self.timeout) as cliente:
+                r = await cliente.get(self.url)
+            m.resultado = r.status_code
+        r.raise_for_status()
+        return self.parse(r.json())
+
+    async def arefrescar(self):
+        datos = await self._adescargar()
+        entrada = {
+            "datos": datos,
+            "indice": self.indexar(datos) if self.indexar else None,
+            "obtenido_en": time.time(),
+        }
+        await _cache().aset(self._key, entrada, timeout=None)
+        return entrada
+
+    async def _atarea_refresco(self):
+        try:
+            await self.arefrescar()
+        except Exception as e:
+            logger.warning("No se pudo refrescar catálogo %s: %s", self.nombre, e)
+        else:
+            await _cache().adelete(self._lock_key)
+
+    async def aentrada(self):
+        entrada = await _cache().aget(self._key)
+        if entrada is None:
+            return await self.arefrescar()
+        if time.time() - entrada["obtenido_en"] > self.ttl:
+            if await _cache().aadd(self._lock_key, 1, timeout=self.LOCK_TIMEOUT):
+                tarea = asyncio.create_task(self._atarea_refresco())
+                self._tareas.add(tarea)
+                tarea.add_done_callback(self._tareas.discard)
+        return entrada
+
+    async def adatos(self):
+        return (await self.aentrada())["datos"]
+
+    async def aindice(self):
+        return (await self.aentrada())["indice"]
+
+
+# ===================== PARSERS =====================
+
+def _parse_platos(data):
+    if isinstance(data, dict) and "results" in data:
+        return data["results"]
+    return data
+
+
+def _indexar_platos(platos):
+    return {p.get("codigo"): p.get("nombre") for p in platos}
+
+
+def _parse_mesas(data):
+    return [
+        m for m in data.get("results", [])
+        if m.get("estado") == "disponible"
+    ]
+
+
+platos = Catalogo(
+    "platos", PLATOS_URL, _parse_platos,
+    ttl_setting="CATALOGO_PLATOS_TTL", indexar=_indexar_platos,
+)
+mesas = Catalogo(
+    "mesas", MESAS_URL, _parse_mesas,
+    ttl_setting="CATALOGO_MESAS_TTL",
+)
@@ -1,3 +1,143 @@
-from django.test import TestCase
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+
+from . import catalogos
+from .views import nombre_plato
+
+
+CACHES_TEST = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "catalogos": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "catalogos-test"},
+}
+
+
+def _respuesta(data):
+    r = mock.Mock()
+    r.json.return_value = data
+    r.raise_for_status.return_value = None
+    return r
+
+
+class _HiloSincrono:
+    """Reemplaza threading.Thread para ejecutar el refresco en el mismo hilo."""
+    def __init__(self, target, daemon=None):
+        self.target = target
+
+    def start(self):
+        self.target()
+
+
+@override_settings(CACHES=CACHES_TEST, CATALOGO_PLATOS_TTL=60)
+class CatalogoPlatosTest(TestCase):
+    def setUp(self):
+        caches["catalogos"].clear()
+
+    def test_descarga_una_vez_y_sirve_desde_cache(self):
+        data = {"results": [{"codigo": "P1", "nombre": "Cazuela"}]}
+        with mock.patch("ui.catalogos.requests.get", return_value=_respuesta(data)) as get:
+            self.assertEqual(catalogos.platos.datos(), data["results"])
+            self.assertEqual(catalogos.platos.indice(), {"P1": "Cazuela"})
+        self.assertEqual(get.call_count, 1)
+
+    def test_vencido_sirve_stale_y_refresca_en_segundo_plano(self):
+        viejo = [{"codigo": "P1", "nombre": "Viejo"}]
+        nuevo = [{"codigo": "P1", "nombre": "Nuevo"}]
+        with mock.patch("ui.catalogos.requests.get", return_value=_respuesta(viejo)):
+            catalogos.platos.refrescar()
+
+        entrada = caches["catalogos"].get("catalogo:platos")
+        entrada["obtenido_en"] = time.time() - 120
+        caches["catalogos"].set("catalogo:platos", entrada, timeout=None)
+
+        with mock.patch("ui.catalogos.requests.get", return_value=_respuesta(nuevo)), \
+             mock.patch("ui.catalogos.threading.Thread", _HiloSincrono):
+            self.assertEqual(catalogos.platos.datos(), viejo)
+        self.assertEqual(catalogos.platos.datos(), nuevo)
+
+    def test_version_async_usa_la_misma_cache(self):
+        import asyncio
+
+        datos = [{"codigo": "P1", "nombre": "Cazuela"}]
+
+        async def descargar():
+            return datos
+
+        with mock.patch.object(catalogos.platos, "_adescargar", side_effect=descargar) as d:
+            self.assertEqual(asyncio.run(catalogos.platos.aindice()), {"P1": "Cazuela"})
+            self.assertEqual(asyncio.run(catalogos.platos.adatos()), datos)
+        self.assertEqual(d.call_count, 1)
+        # La copia queda para la ruta sync.
+        self.assertEqual(catalogos.platos.datos(), datos)
+
+    def test_api_caida_mantiene_ultima_copia(self):
+        buenos = [{"codigo": "P1", "nombre": "Cazuela"}]
+        with mock.patch("ui.catalogos.requests.get", return_value=_respuesta(buenos)):
+            catalogos.platos.refrescar()
+
+        entrada = caches["catalogos"].get("catalogo:platos")
+        entrada["obtenido_en"] = time.time() - 120
+        caches["catalogos"].set("catalogo:platos", entrada, timeout=None)
+
+        with mock.patch("ui.catalogos.requests.get", side_effect=ConnectionError("caída")) as get, \
+             mock.patch("ui.catalogos.threading.Thread", _HiloSincrono):
+            self.assertEqual(catalogos.platos.datos(), buenos)
+            self.assertEqual(catalogos.platos.datos(), buenos)
+        # Tras el fallo el lock queda hasta su TTL: no se reintenta en cada request.
+        self.assertEqual(get.call_count, 1)
+        self.assertIsNotNone(caches["catalogos"].get("catalogo:platos:refrescando"))
+
+    def test_nombre_plato_usa_indice(self):
+        indice = {"P1": "Cazuela"}
+        self.assertEqual(nombre_plato("P1", indice), "Cazuela")
+        self.assertEqual(nombre_plato("X", indice), "X")
+
+
+class AccionesUiTest(TestCase):
+    """Las acciones de la UI llaman a pedidos.services sin pasar por HTTP."""
+
+    def test_crear_y_confirmar_sin_http(self):
+        from pedidos.models import Pedido
+        from django.urls import reverse
+
+        with mock.patch("requests.sessions.Session.request") as http:
+            r = self.client.post(reverse("ui:crear_pedido"), {"mesa": "3", "cliente": "Eva", "plato": "P1"})
+            self.assertEqual(r.status_code, 302)
+            p = Pedido.objects.get()
+            self.client.get(reverse("ui:confirmar", args=[p.id]))
+        http.assert_not_called()
+        p.refresh_from_db()
+        self.assertEqual(p.estado, Pedido.Estado.EN_PREPARACION)
+
+
+@override_settings(CACHES=CACHES_TEST)
+class CocinaEnVivoTest(TestCase):
+    def test_pagina_se_suscribe_al_stream(self):
+        from django.urls import reverse
+
+        caches["catalogos"].set(
+            "catalogo:platos",
+            {"datos": [], "indice": {"P1": "Cazuela"}, "obtenido_en": time.time()},
+            timeout=None,
+        )
+        r = self.client.get(reverse("ui:cocina"))
+        self.assertEqual(r.status_code, 200)
+        self.assertContains(r, "/api/pedidos/stream/?ultimo=")
+        self.assertContains(r, '"P1": "Cazuela"')
+
+    def test_cola_solo_activos_por_llegada(self):
+        from django.urls import reverse
+        from pedidos import services
+
+        caches["catalogos"].set(
+            "catalogo:platos", {"datos": [], "indice": {}, "obtenido_en": time.time()}, timeout=None,
+        )
+        primero = services.crear_pedido(mesa=1, plato="P1")
+        cerrado = services.crear_pedido(mesa=2, plato="P1")
+        services.cancelar(cerrado.id)
+        segundo = services.crear_pedido(mesa=3, plato="P1")
+
+        r = self.client.get(reverse("ui:cocina"))
+        self.assertEqual([p["id"] for p in r.context["pedidos"]], [primero.id, segundo.id])
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
@@ -22,3 +23,9 @@ urlpatterns = [
     # Stock ✅
     path("stock/", views.stock, name="stock"),
 ]
+
+if settings.ASYNC_VIEWS:
+    from pedidos.asincrono import envolver
+
+    # El catálogo se trae con httpx en el event loop; la vista ya lo lee de caché.
+    envolver(urlpatterns, {"mesero", "cocina"}, antes=views.precargar_catalogos)
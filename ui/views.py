@@ -2,115 +2,99 @@ from django.shortcuts import render, redirect
 from django.contrib import messages
 from django.views.decorators.http import require_http_methods
 from django.utils.timezone import localtime
-import requests
+import asyncio
 import datetime
 
+from rest_framework.request import Request
 
-# ===================== HELPERS (SE MANTIENEN) =====================
-
-def _api_base(request) -> str:
-    return request.build_absolute_uri("/").rstrip("/")
-
-def _abs(request, path: str) -> str:
-    if not path.startswith("/"):
-        path = "/" + path
-    return f"{_api_base(request)}{path}"
-
-def _ensure_slash(url: str) -> str:
-    return url if url.endswith("/") else url + "/"
-
-def _api_get(request, path):
-    return requests.get(_abs(request, path), timeout=10)
-
-def _api_post(request, path, json=None):
-    return requests.post(
-        _ensure_slash(_abs(request, path)),
-        json=(json or {}),
-        timeout=10
-    )
-
-def _api_patch(request, path, json=None):
-    return requests.patch(
-        _ensure_slash(_abs(request, path)),
-        json=(json or {}),
-        timeout=10
-    )
+from pedidos import eventos, services
+from pedidos.models import Pedido
+from pedidos.pagination import CocinaCursorPagination, PedidoCursorPagination
+from . import catalogos
 
 
 # ===================== UTIL =====================
 
-def _fmt_hhmm(iso_str):
-    if not iso_str:
+def _fmt_hhmm(valor):
+    """Formatea un datetime (o string ISO) como 'dd/mm HH:MM' en hora local."""
+    if not valor:
         return "—"
     try:
-        dt = datetime.datetime.fromisoformat(iso_str.replace("Z", "+00:00"))
+        if isinstance(valor, datetime.datetime):
+            dt = valor
+        else:
+            dt = datetime.datetime.fromisoformat(valor.replace("Z", "+00:00"))
         dt = localtime(dt) if dt.tzinfo else dt
         return dt.strftime("%d/%m %H:%M")
     except Exception:
-        return iso_str
+        return valor
 
 
-# ===================== PLATOS (API EXTERNA) =====================
+# ===================== PLATOS (API EXTERNA, CACHEADA) =====================
 
 def load_platos():
-    url = "https://web-production-2d3fb.up.railway.app/api/platos/"
-    r = requests.get(url, timeout=10)
-    r.raise_for_status()
+    return catalogos.platos.datos()
 
-    data = r.json()
-    if isinstance(data, dict) and "results" in data:
-        return data["results"]
-    return data
 
+async def precargar_catalogos(request):
+    """
+    Bajo ASGI: deja platos y mesas en caché, en paralelo y sin bloquear el
+    event loop. Los errores los informa después la vista al leerlos.
+    """
+    await asyncio.gather(
+        catalogos.platos.aentrada(), catalogos.mesas.aentrada(), return_exceptions=True
+    )
 
-def nombre_plato(codigo, platos):
-    for p in platos:
-        if p.get("codigo") == codigo:
-            return p.get("nombre")
-    return codigo
 
+def load_indice_platos():
+    """Índice codigo -> nombre, construido una vez por refresco del catálogo."""
+    return catalogos.platos.indice()
 
-# ===================== MESAS (API EXTERNA) =====================
 
-def load_mesas():
-    url = "https://sistema-gestion-restaurant.up.railway.app/api/mesas/"
-    r = requests.get(url, timeout=10)
-    r.raise_for_status()
+def nombre_plato(codigo, indice):
+    return indice.get(codigo, codigo)
+
 
-    data = r.json()
-    return [
-        m for m in data.get("results", [])
-        if m.get("estado") == "disponible"
-    ]
+# ===================== MESAS (API EXTERNA, CACHEADA) =====================
+
+def load_mesas():
+    return catalogos.mesas.datos()
 
 
 # ===================== PEDIDOS =====================
 
-def load_pedidos(request, platos):
-    r = _api_get(request, "/api/pedidos/")
-    r.raise_for_status()
+_CAMPOS_UI = ("id", "mesa", "cliente", "plato", "estado", "creado_en", "actualizado_en")
 
-    data = r.json()
-    if isinstance(data, dict) and "results" in data:
-        data = data["results"]
+
+def load_pedidos(request, indice_platos, qs, paginador):
+    """
+    Carga solo la página de ``qs`` que se muestra (paginación por cursor,
+    igual que la API). Devuelve ``(pedidos, paginacion)``.
+    """
+    pagina = paginador.paginate_queryset(qs.values(*_CAMPOS_UI), Request(request))
 
     pedidos = []
-    for p in data:
-        p = dict(p)
-        p["plato_nombre"] = nombre_plato(p.get("plato"), platos)
+    for p in pagina:
+        p["plato_nombre"] = nombre_plato(p.get("plato"), indice_platos)
         p["creado_str"] = _fmt_hhmm(p.get("creado_en"))
+        p["actu_str"] = _fmt_hhmm(p.get("actualizado_en"))
         pedidos.append(p)
 
-    return pedidos
+    paginacion = {
+        "siguiente": paginador.get_next_link(),
+        "anterior": paginador.get_previous_link(),
+    }
+    return pedidos, paginacion
 
 
 # ===================== MESERO =====================
 
 def mesero(request):
     try:
-        platos = load_platos()
+        entrada = catalogos.platos.entrada()
+        platos, indice_platos = entrada["datos"], entrada["indice"]
     except Exception as e:
-        platos = []
+        platos, indice_platos = [], {}
         messages.error(request, f"No se pudieron cargar platos: {e}")
 
     try:
@@ -120,102 +104,120 @@ def mesero(request):
         messages.error(request, f"No se pudieron cargar mesas: {e}")
 
     try:
-        pedidos = load_pedidos(request, platos)
+        pedidos, paginacion = load_pedidos(
+            request, indice_platos, services.listar_pedidos(), PedidoCursorPagination()
+        )
     except Exception as e:
-        pedidos = []
+        pedidos, paginacion = [], {}
         messages.error(request, f"No se pudieron cargar pedidos: {e}")
 
     return render(request, "ui/mesero.html", {
         "platos": platos,
         "mesas": mesas,
-        "pedidos": pedidos
+        "pedidos": pedidos,
+        "paginacion": paginacion,
     })
 
 
 @require_http_methods(["POST"])
 def crear_pedido(request):
-    mesa = request.POST.get("mesa")
-    cliente = request.POST.get("cliente")
-    plato = request.POST.get("plato")
-
-    body = {
-        "mesa": int(mesa),
-        "cliente": cliente,
-        "plato": plato
-    }
-
-    r = _api_post(request, "/api/pedidos/", json=body)
-
-    if r.status_code in (200, 201):
-        messages.success(request, "Pedido creado correctamente.")
+    # Un pedido por plato elegido, todos en un solo alta en lote.
+    platos = request.POST.getlist("plato") or [""]
+    try:
+        mesa = int(request.POST.get("mesa"))
+        pedidos = services.crear_pedidos([
+            {"mesa": mesa, "cliente": request.POST.get("cliente"), "plato": plato}
+            for plato in platos
+        ])
+    except (TypeError, ValueError):
+        messages.error(request, "Error al crear pedido: mesa inválida.")
+    except services.PedidoError as e:
+        messages.error(request, f"Error al crear pedido: {e}")
     else:
-        messages.error(request, f"Error al crear pedido (HTTP {r.status_code}).")
+        if len(pedidos) == 1:
+            messages.success(request, "Pedido creado correctamente.")
+        else:
+            messages.success(request, f"{len(pedidos)} pedidos creados correctamente.")
 
     return redirect("ui:mesero")
 
 
 # ===================== ACCIONES MESERO =====================
 
-def accion_confirmar(request, pedido_id):
-    r = _api_post(request, f"/api/pedidos/{pedido_id}/confirmar/")
-    if r.status_code == 200:
-        messages.success(request, "Pedido confirmado.")
+def _accion(request, operacion, pedido_id, ok, error, nivel=messages.SUCCESS):
+    try:
+        operacion(pedido_id)
+    except services.PedidoError as e:
+        messages.error(request, f"{error} {e}")
     else:
-        messages.error(request, "No se pudo confirmar.")
+        messages.add_message(request, nivel, ok)
+
+
+def accion_confirmar(request, pedido_id):
+    _accion(request, services.confirmar, pedido_id,
+            "Pedido confirmado.", "No se pudo confirmar.")
     return redirect("ui:mesero")
 
 
 def accion_cancelar(request, pedido_id):
-    r = _api_post(request, f"/api/pedidos/{pedido_id}/cancelar/")
-    if r.status_code == 200:
-        messages.info(request, "Pedido cancelado.")
-    else:
-        messages.error(request, "No se pudo cancelar.")
+    _accion(request, services.cancelar, pedido_id,
+            "Pedido cancelado.", "No se pudo cancelar.", nivel=messages.INFO)
     return redirect("ui:mesero")
 
 
 def accion_entregar(request, pedido_id):
-    r = _api_patch(request, f"/api/pedidos/{pedido_id}/entregar/")
-    if r.status_code == 200:
-        messages.success(request, "Pedido entregado.")
-    else:
-        messages.error(request, "No se pudo entregar.")
+    _accion(request, services.entregar, pedido_id,
+            "Pedido entregado.", "No se pudo entregar.")
     return redirect("ui:mesero")
 
 
 def accion_cerrar(request, pedido_id):
-    r = _api_patch(request, f"/api/pedidos/{pedido_id}/cerrar/")
-    if r.status_code == 200:
-        messages.success(request, "Pedido cerrado.")
-    else:
-        messages.error(request, "No se pudo cerrar.")
+    _accion(request, services.cerrar, pedido_id,
+            "Pedido cerrado.", "No se pudo cerrar.")
     return redirect("ui:mesero")
 
 
 # ===================== COCINA =====================
 
 def cocina(request):
-    platos = load_platos()
-    pedidos = load_pedidos(request, platos)
-    return render(request, "ui/cocina.html", {"pedidos": pedidos})
+    # La marca de eventos se toma antes de leer los pedidos: el stream
+    # reenvía lo que cambie desde ahí y la página no pierde cambios.
+    ultimo_evento = eventos.marca()
+    indice_platos = load_indice_platos()
+    # Solo la cola activa, por llegada (como /api/cocina/lista/): el
+    # historial de cerrados/cancelados no pasa por el índice parcial.
+    pedidos, paginacion = load_pedidos(
+        request, indice_platos, Pedido.objects.activos(), CocinaCursorPagination()
+    )
+    return render(request, "ui/cocina.html", {
+        "pedidos": pedidos,
+        "paginacion": paginacion,
+        "indice_platos": indice_platos,
+        "ultimo_evento": ultimo_evento,
+    })
 
 
 def cocina_en_preparacion(request, pedido_id):
-    _api_post(request, f"/api/pedidos/{pedido_id}/confirmar/")
+    try:
+        services.confirmar(pedido_id)
+    except services.PedidoError:
+        pass
     return redirect("ui:cocina")
 
 
 def cocina_sin_ingredientes(request, pedido_id):
-    _api_post(request, f"/api/pedidos/{pedido_id}/cancelar/")
+    try:
+        services.cancelar(pedido_id)
+    except services.PedidoError:
+        pass
     return redirect("ui:cocina")
 
 
 def cocina_listo(request, pedido_id):
-    _api_post(
-        request,
-        "/api/webhooks/cocina/pedido-listo/",
-        json={"pedido_id": str(pedido_id)}
-    )
+    try:
+        services.marcar_listo(pedido_id)
+    except services.PedidoError:
+        pass
     return redirect("ui:cocina")
 
 